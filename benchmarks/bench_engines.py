@@ -0,0 +1,84 @@
+"""
+Benchmark of the FINANCIALS_ENGINE engines: the uncached sums of aggregate and build_cube on the bundled dataset
+repeated a number of times, with the dates of each copy shifted by a year so the cube grows with it.
+
+Usage: python benchmarks/bench_engines.py [copies] [repeats]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import financials_data as fd
+import financials_engine as fe
+
+
+ENGINES = ['pandas', 'kernel', 'duckdb', 'sqlite']
+
+GROUPINGS = [[fd.Country], [fd.Country, fd.Product], [fd.Date, fd.Country]]
+
+
+def build_dataset(copies):
+    """
+    Returns the bundled dataset repeated 'copies' times, each copy a year later than the previous one.
+    """
+
+    df = fd.read_and_clean_financials(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                   'Financials.csv'))
+
+    frames = []
+    for copy in range(copies):
+        frame = df.copy()
+        frame[fd.Date] = frame[fd.Date] + pd.DateOffset(years=copy)
+        frames.append(frame)
+
+    return fd.add_calendar_columns(pd.concat(frames, ignore_index=True))
+
+
+def time_call(function, repeats):
+    """
+    Returns the median time of a call in milliseconds, after a first call that is not timed.
+    """
+
+    function()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return np.median(times) * 1e3
+
+
+def main(copies=300, repeats=10):
+    df = build_dataset(copies)
+    print(f'{len(df):,} rows, {len(fe.build_cube(df)):,} cube cells')
+
+    if fe.duckdb is None:
+        print('duckdb is not installed, its engine runs on SQLite')
+
+    for engine in ENGINES:
+        fe.FINANCIALS_ENGINE = engine
+
+        # Each engine gets its own copy, since the SQL databases are cached per DataFrame
+        engine_df = df.copy()
+
+        results = []
+        for by in GROUPINGS:
+            milliseconds = time_call(lambda: fe._sum_measures(engine_df, by, [fd.Sales, fd.Units_Sold]), repeats)
+            results.append(f'{"+".join(by)} {milliseconds:7.2f}ms')
+
+        milliseconds = time_call(lambda: fe.build_cube(engine_df), repeats)
+        results.append(f'cube {milliseconds:7.2f}ms')
+
+        print(f'{engine:7} ' + '  '.join(results))
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:]])
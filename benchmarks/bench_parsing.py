@@ -0,0 +1,81 @@
+"""
+Benchmark of parse_accounting_numbers against the two regex replace passes clean_financials used before it, on a
+Profit-like column of the bundled dataset repeated to 1k, 1M and 10M rows, and on 1M distinct values.
+
+Usage: python benchmarks/bench_parsing.py [rows ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import financials_data as fd
+
+
+def parse_with_replace(values):
+    """
+    Parses accounting formatted strings the way clean_financials did before parse_accounting_numbers: a whitespace
+    strip, two regex replace passes and a float cast.
+    """
+
+    values = values.str.strip()
+    values = values.replace({r'\$': '', '-': '0', ',': ''}, regex=True)
+    values = values.replace({r'\(': '-', r'\)': '', ' ': ''}, regex=True)
+
+    return values.astype(float)
+
+
+def dataset_values(rows):
+    """
+    Returns 'rows' raw Profit strings of the bundled dataset, repeated as many times as needed.
+    """
+
+    raw_df = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Financials.csv'))
+    raw_df.columns = raw_df.columns.str.strip()
+
+    return pd.Series(np.resize(raw_df[fd.Profit].to_numpy(), rows), name=fd.Profit)
+
+
+def distinct_values(rows):
+    """
+    Returns 'rows' distinct accounting formatted strings, a third of them negative and some of them zero.
+    """
+
+    cents = np.arange(rows) - rows // 3
+    formatted = [f' $({-c / 100:,.2f}) ' if c < 0 else (' $-   ' if c == 0 else f' ${c / 100:,.2f} ') for c in cents]
+
+    return pd.Series(formatted, name=fd.Profit)
+
+
+def time_call(function, values):
+    """
+    Returns the time of one call in seconds, and its result.
+    """
+
+    start = time.perf_counter()
+    parsed = function(values)
+
+    return time.perf_counter() - start, parsed
+
+
+def main(*rows_list):
+    cases = [(f'{rows:,} rows', dataset_values(rows)) for rows in rows_list or (1_000, 1_000_000, 10_000_000)]
+    if not rows_list:
+        cases.insert(2, ('1,000,000 distinct', distinct_values(1_000_000)))
+
+    for name, values in cases:
+        replace_seconds, expected = time_call(parse_with_replace, values)
+        parse_seconds, parsed = time_call(fd.parse_accounting_numbers, values)
+
+        pd.testing.assert_series_equal(parsed, expected)
+        print(f'{name:20} replace {replace_seconds:8.3f}s  parse_accounting_numbers {parse_seconds:7.3f}s  '
+              f'{replace_seconds / parse_seconds:6.1f}x')
+
+
+if __name__ == '__main__':
+    main(*[int(argument) for argument in sys.argv[1:]])
@@ -0,0 +1,774 @@
+import os
+import io
+import glob
+import hashlib
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+# pyarrow is installed with streamlit, but the snapshot is only an optimisation, so work without it
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+
+
+# Location of the dataset: a CSV file, a directory of partition CSVs or a glob pattern such as 'exports/*.csv'.
+# Defaults to the Financials.csv next to the dashboard scripts
+FINANCIALS_CSV = os.environ.get('FINANCIALS_CSV',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Financials.csv'))
+
+# Rows per chunk for the streaming ingestion mode. Leave FINANCIALS_CHUNKSIZE unset to load the full row level dataset
+FINANCIALS_CHUNKSIZE = int(os.environ.get('FINANCIALS_CHUNKSIZE', 0)) or None
+
+# Set FINANCIALS_COMPACT=1 to keep the money columns as integer cents and Units Sold as int32 (see compact_financials)
+FINANCIALS_COMPACT = os.environ.get('FINANCIALS_COMPACT') == '1'
+
+
+# Create variables for Column Names
+[ Segment, Country, Product, Discount_Band, Units_Sold,
+ Manufacturing_Price, Sale_Price, Gross_Sales, Discounts,
+ Sales, COGS, Profit, Date, Month_Number, Month_Name, Year
+] = ['Segment', 'Country', 'Product', 'Discount Band', 'Units Sold',
+ 'Manufacturing Price', 'Sale Price', 'Gross Sales', 'Discounts',
+ 'Sales', 'COGS', 'Profit', 'Date', 'Month Number', 'Month Name', 'Year']
+
+
+# Seperate Columns into Dimensions (i.e Categorical) and Numerical Columns
+Numerical_Columns = [Units_Sold, Manufacturing_Price, Sale_Price, Gross_Sales, Discounts, Sales, COGS, Profit]
+
+Dimension_Columns = [Segment, Country, Product, Discount_Band]
+
+Varying_Numerical_Columns =  [Gross_Sales, Discounts, Sales, COGS, Profit]
+
+# Numerical Columns holding currency amounts with two decimals
+Money_Columns = [Manufacturing_Price, Sale_Price, Gross_Sales, Discounts, Sales, COGS, Profit]
+
+#This is basically repeated in the Date Column
+Non_Essential_columns = [Month_Number, Month_Name, Year]
+
+# Integer calendar columns rebuilt from the Date column at load time, so year filters are integer comparisons
+Quarter = 'Quarter'
+Calendar_Columns = [Year, Month_Number, Quarter]
+
+# Dates in the dataset are written as day/month/year
+Date_Format = '%d/%m/%Y'
+
+# Order of the Discount Band labels, from no discount to the largest discount
+Discount_Band_Order = ['None', 'Low', 'Medium', 'High']
+
+
+# Number of bytes before the processed offset of a file that must be unchanged for it to count as appended to
+_TAIL_FINGERPRINT_BYTES = 1 << 16
+
+
+# Snapshot metadata key and format version. Bump the version whenever clean_financials changes its output,
+# so snapshots written by older code are regenerated
+_SNAPSHOT_METADATA_KEY = b'financials_source'
+_SNAPSHOT_VERSION = 3
+
+
+
+# Accounting format: '$', ',', ')' and spaces are dropped, '(' opens a negative number and a lone '-' stands for zero
+_ACCOUNTING_TRANSLATION = str.maketrans({'$': None, ',': None, ')': None, ' ': None, '-': '0', '(': '-'})
+
+
+#======================================================================================================
+
+def parse_accounting_numbers(values):
+    """
+    Converts a Series of accounting formatted strings such as ' $1,618.50 ', ' $-   ' and '$(4,533.75)' to floats.
+    
+    Parameters:
+    values: A Series of accounting formatted strings. Missing values are kept as NaN and numeric Series are only cast to float.
+    
+    Returns:
+    parsed: A float Series with the same index and name as 'values'.
+    """
+    
+    # Columns that pandas already read as numbers need no parsing
+    if not pd.api.types.is_object_dtype(values):
+        return values.astype(float)
+    
+    # Parse each distinct string once. Prices and discounts repeat a lot, so most rows become a single array lookup
+    codes, uniques = pd.factorize(values)
+    
+    # Remove the currency symbols and map the brackets and dashes in a single str.translate pass, then convert to float
+    parsed = pd.Series(uniques, dtype=object).str.translate(_ACCOUNTING_TRANSLATION).astype(float).to_numpy()
+    
+    # Missing values are coded as -1 by factorize, so a trailing NaN makes them come out as NaN
+    parsed = np.append(parsed, np.nan)
+    
+    return pd.Series(parsed[codes], index=values.index, name=values.name)
+
+#======================================================================================================
+
+def encode_dimension_columns(df):
+    """
+    Converts the Dimension Columns of a DataFrame to categoricals.
+    
+    The categories of Segment, Country and Product are sorted alphabetically. Discount Band is an ordered categorical
+    that follows Discount_Band_Order, with any unknown band appended in alphabetical order.
+    
+    Parameters:
+    df: A DataFrame holding the Dimension Columns as strings or categoricals.
+    
+    Returns:
+    df: The same DataFrame with its Dimension Columns encoded as categoricals.
+    """
+    
+    for column in Dimension_Columns:
+        # Categories are rebuilt from the values, so frames combined from several chunks end up with one dictionary
+        present_values = pd.unique(df[column].dropna().astype(object))
+        
+        df[column] = pd.Categorical(df[column].astype(object),
+                                    categories=get_dimension_categories(column, present_values),
+                                    ordered=column == Discount_Band)
+    
+    return df
+
+
+def get_dimension_categories(column, present_values):
+    """
+    Returns the categories of a Dimension Column in their display order.
+    
+    Parameters:
+    column: The name of the Dimension Column.
+    present_values: The distinct labels found in the data.
+    
+    Returns:
+    categories: The labels sorted alphabetically, or for 'Discount Band' in Discount_Band_Order with any unknown band appended in alphabetical order.
+    """
+    
+    if column == Discount_Band:
+        # Keep the known bands in their natural order and append anything unexpected at the end
+        categories = [band for band in Discount_Band_Order if band in present_values]
+        categories += sorted(set(present_values) - set(Discount_Band_Order))
+        return categories
+    
+    return sorted(present_values)
+
+
+def add_calendar_columns(df):
+    """
+    Adds the Year (int16), Month Number (int8) and Quarter (int8) of the 'Date' column to a DataFrame.
+    
+    Parameters:
+    df: A DataFrame with a datetime 'Date' column.
+    
+    Returns:
+    df: The same DataFrame with the Calendar Columns added.
+    """
+    
+    dates = df[Date].dt
+    
+    df[Year] = dates.year.astype(np.int16)
+    df[Month_Number] = dates.month.astype(np.int8)
+    df[Quarter] = dates.quarter.astype(np.int8)
+    
+    return df
+
+
+def clean_financials(df):
+    """
+    Cleans a raw DataFrame read from a Financials-format CSV.
+
+    Parameters:
+    df: The raw DataFrame as returned by pd.read_csv.
+
+    Returns:
+    df: The cleaned DataFrame with stripped text, numerical columns converted to numbers, a datetime 'Date' column, the non essential columns removed and the Calendar Columns rebuilt from 'Date'.
+    """
+
+    # Pre-processing:
+    # 1. Check for column names and Fix Errors
+    # 2. Trim All White spaces in the text columns of the dataset
+    # 3. Parse the accounting formatted Numerical Columns ($, commas, '-' for zero, brackets for negatives) into numbers
+
+    # Remove leading and trailing whitespaces from column names
+    df.columns = df.columns.str.strip()
+
+    # Select columns of object and string data types from the DataFrame 'df'. The Numerical Columns are left out
+    # because parse_accounting_numbers already drops their spaces
+    df_obj = df.select_dtypes(['object', 'string']).drop(columns=Numerical_Columns, errors='ignore')
+
+    # Apply the strip method to all elements in the selected columns to remove leading and trailing whitespaces
+    df[df_obj.columns] = df_obj.apply(lambda x: x.str.strip())
+
+    # Convert Numerical columns to Float data type in one pass and Units Sold column to Integer whole numbers
+    df[Numerical_Columns] = df[Numerical_Columns].apply(parse_accounting_numbers)
+    df[Units_Sold] = df[Units_Sold].astype(int)
+
+    # Convert date column to datetime. An explicit format skips per-load format inference and reads the days first
+    df[Date] = pd.to_datetime(df[Date], format=Date_Format)
+
+    # Delete Non essential columns and rebuild the calendar ones from the parsed dates
+    df = df.drop(Non_Essential_columns, axis=1)
+    df = add_calendar_columns(df)
+
+    # Encode the Dimension Columns as categoricals, so grouping and filtering work on integer codes
+    df = encode_dimension_columns(df)
+
+    return df
+
+#======================================================================================================
+
+def get_snapshot_path(path):
+    """
+    Returns the path of the binary snapshot kept next to a Financials-format CSV file.
+    
+    Parameters:
+    path: The path to the CSV file.
+    
+    Returns:
+    snapshot_path: The same path with the extension replaced by '.feather'.
+    """
+    
+    return os.path.splitext(path)[0] + '.feather'
+
+
+def get_file_hash(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents, read in 1 MiB blocks.
+    """
+    
+    file_hash = hashlib.sha256()
+    
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            file_hash.update(block)
+    
+    return file_hash.hexdigest()
+
+
+def _read_snapshot(snapshot_path, source_tag):
+    """
+    Returns the DataFrame stored in a snapshot, or None if it is missing, unreadable or was built from another source.
+    """
+    
+    if pa is None or not os.path.exists(snapshot_path):
+        return None
+    
+    try:
+        table = feather.read_table(snapshot_path)
+    except (OSError, pa.ArrowException):
+        return None
+    
+    # Only trust snapshots written from the same CSV contents by the same snapshot version
+    metadata = table.schema.metadata or {}
+    if metadata.get(_SNAPSHOT_METADATA_KEY) != source_tag:
+        return None
+    
+    return table.to_pandas()
+
+
+def _write_snapshot(df, snapshot_path, source_tag):
+    """
+    Writes the cleaned DataFrame to an Arrow IPC (Feather) snapshot tagged with its source.
+    
+    The file is written to a temporary name and renamed into place, so a concurrent reader never sees a partial snapshot.
+    A failure to write (e.g. a read-only deploy directory) is ignored; the next start simply parses the CSV again.
+    """
+    
+    if pa is None:
+        return
+    
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, _SNAPSHOT_METADATA_KEY: source_tag})
+    
+    temporary_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    try:
+        feather.write_feather(table, temporary_path)
+        os.replace(temporary_path, snapshot_path)
+    except (OSError, pa.ArrowException):
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def read_and_clean_financials(path):
+    """
+    Returns the cleaned DataFrame for a Financials-format CSV, using its binary snapshot when it is up to date.
+    
+    Parameters:
+    path: The path to the CSV file.
+    
+    Returns:
+    df: The cleaned DataFrame. When the snapshot is missing or stale, the CSV is parsed and the snapshot regenerated.
+    """
+    
+    # Hashing the file is far cheaper than parsing it, and catches content changes that keep the same size
+    source_tag = f'{_SNAPSHOT_VERSION}:{get_file_hash(path)}'.encode()
+    snapshot_path = get_snapshot_path(path)
+    
+    df = _read_snapshot(snapshot_path, source_tag)
+    
+    if df is None:
+        df = clean_financials(pd.read_csv(path))
+        _write_snapshot(df, snapshot_path, source_tag)
+    
+    return df
+
+#======================================================================================================
+
+def iter_financials_chunks(path, chunksize):
+    """
+    Reads a Financials-format CSV in chunks and yields each chunk already cleaned.
+    
+    Parameters:
+    path: The path to the CSV file.
+    chunksize: The number of rows to read and clean at a time.
+    
+    Returns:
+    A generator of cleaned DataFrames, each holding at most 'chunksize' rows.
+    """
+    
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield clean_financials(chunk)
+
+
+def _sum_by_dimensions_and_date(df):
+    """
+    Sums the Numerical Columns of a cleaned DataFrame over every Dimension Columns and Date combination.
+    """
+    
+    # pandas drops missing categorical keys even with dropna=False, so group on the codes shifted by one, where 0 stands
+    # for a missing label, as build_cube does. Rows with missing labels are kept, so the totals match the row level totals
+    keys = [(df[column].cat.codes + 1).rename(column) for column in Dimension_Columns] + [df[Date]]
+    totals_df = df[Numerical_Columns].groupby(keys, sort=False, dropna=False).sum().reset_index()
+    
+    # Decode the shifted codes back into labels, missing labels included
+    for column in Dimension_Columns:
+        totals_df[column] = pd.Categorical.from_codes(totals_df[column].to_numpy() - 1, dtype=df[column].dtype)
+    
+    return totals_df
+
+
+def stream_financials_totals(path, chunksize):
+    """
+    Builds the Financials totals per Dimension Columns and Date combination without holding all rows in memory.
+    
+    Every chart aggregation in the dashboards (bar, stacked bar and bump) is a sum over some of the Dimension Columns and
+    Date, so it gives the same result on these totals as on the row level data. Peak memory is bounded by one chunk plus
+    the totals, whose size depends on the number of distinct combinations rather than on the number of rows.
+    
+    Parameters:
+    path: The path to a Financials-format CSV file.
+    chunksize: The number of rows to read and clean at a time.
+    
+    Returns:
+    totals_df: A DataFrame with the same columns as the cleaned dataset and one row per Dimension Columns and Date combination.
+    """
+    
+    partial_totals = []
+    partial_rows = 0
+    
+    for chunk in iter_financials_chunks(path, chunksize):
+        chunk_totals = _sum_by_dimensions_and_date(chunk)
+        partial_totals.append(chunk_totals)
+        partial_rows += len(chunk_totals)
+        
+        # Fold the partial totals together once they add up to a chunk's worth of rows, to keep memory bounded
+        if partial_rows > chunksize and len(partial_totals) > 1:
+            partial_totals = [combine_financials_partitions(partial_totals, totals=True)]
+            partial_rows = len(partial_totals[0])
+    
+    # Combine the remaining partial totals into the final table. Each chunk has its own categories, which are merged here
+    return combine_financials_partitions(partial_totals, totals=True)
+
+
+def _finish_totals(totals_df):
+    """
+    Gives a table of totals per Dimension Columns and Date the column order and types of the cleaned dataset.
+    """
+    
+    totals_df = totals_df[Dimension_Columns + Numerical_Columns + [Date]]
+    totals_df[Units_Sold] = totals_df[Units_Sold].astype(int)
+    totals_df = encode_dimension_columns(totals_df)
+    totals_df = add_calendar_columns(totals_df)
+    
+    return totals_df
+
+#======================================================================================================
+
+def get_partition_paths(path):
+    """
+    Returns the CSV files that make up a Financials dataset.
+    
+    Parameters:
+    path: A CSV file, a directory holding one CSV file per partition (e.g. per year or region), or a glob pattern of
+          which only the '.csv' matches are kept.
+    
+    Returns:
+    paths: The sorted absolute paths of the partition files.
+    """
+    
+    if os.path.isfile(path):
+        return [os.path.abspath(path)]
+    
+    # Only keep CSV files, since a pattern such as 'exports/2014*' also matches the snapshots written next to them
+    pattern = os.path.join(path, '*.csv') if os.path.isdir(path) else path
+    paths = sorted(os.path.abspath(partition_path) for partition_path in glob.glob(pattern)
+                   if os.path.splitext(partition_path)[1].lower() == '.csv')
+    
+    if not paths:
+        raise FileNotFoundError(f'No Financials CSV files found at {path!r}')
+    
+    return paths
+
+
+def combine_financials_partitions(frames, totals=False):
+    """
+    Concatenates cleaned partitions into a single DataFrame with one categorical dictionary per Dimension Column.
+    
+    Each partition is recoded to the union of all categories before concatenation, so the result stays categorical and
+    no label is hashed again.
+    
+    Parameters:
+    frames: A list of cleaned DataFrames, or of totals from stream_financials_totals when 'totals' is True.
+    totals: If True, matching Dimension Columns and Date combinations from different partitions are summed together.
+    
+    Returns:
+    df: The combined DataFrame.
+    """
+    
+    dimension_dtypes = {}
+    
+    for column in Dimension_Columns:
+        present_values = set().union(*(frame[column].cat.categories for frame in frames))
+        dimension_dtypes[column] = pd.CategoricalDtype(get_dimension_categories(column, present_values),
+                                                       ordered=column == Discount_Band)
+    
+    # Recoding works on the integer codes, and the input frames are left untouched since they may be shared
+    df = pd.concat([frame.astype(dimension_dtypes, copy=False) for frame in frames], ignore_index=True)
+    
+    if totals:
+        df = _finish_totals(_sum_by_dimensions_and_date(df))
+    
+    return df
+
+
+def read_financials_partitions(paths, chunksize=None):
+    """
+    Reads and cleans the partitions of a Financials dataset in parallel and combines them.
+    
+    Each partition is parsed in its own process (and uses its own snapshot, see read_and_clean_financials), so the
+    ingestion time scales down with the number of cores up to the number of partitions.
+    
+    Parameters:
+    paths: The partition files, as returned by get_partition_paths.
+    chunksize: If given, each partition is streamed and reduced to totals, see stream_financials_totals.
+    
+    Returns:
+    df: The combined cleaned DataFrame, or the combined totals when 'chunksize' is given.
+    """
+    
+    if chunksize:
+        load_partition = functools.partial(stream_financials_totals, chunksize=chunksize)
+    else:
+        load_partition = read_and_clean_financials
+    
+    # A single file gains nothing from a process pool
+    if len(paths) == 1:
+        return load_partition(paths[0])
+    
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        frames = list(pool.map(load_partition, paths))
+    
+    return combine_financials_partitions(frames, totals=bool(chunksize))
+
+#======================================================================================================
+
+def _smallest_int_dtype(values):
+    """
+    Returns int32 if every value fits in it, int64 otherwise.
+    """
+    
+    int32_info = np.iinfo(np.int32)
+    
+    if len(values) == 0 or (values.min() >= int32_info.min and values.max() <= int32_info.max):
+        return np.int32
+    
+    return np.int64
+
+
+def compact_financials(df, cents_columns=None):
+    """
+    Converts a cleaned DataFrame to the compact storage mode.
+    
+    Money Columns are stored as integer cents and Units Sold as a whole number, each as int32 when all values fit and
+    int64 otherwise. Sums of integer cents are exact; use cents_to_dollars to convert aggregated results back to dollars.
+    Money columns holding missing values are left as floats.
+    
+    Parameters:
+    df: A cleaned Financials DataFrame.
+    cents_columns: The Money Columns to store as integer cents, none of which may hold missing values. Defaults to the
+                   Money Columns without missing values. Rows appended to a compact dataset pass the columns it holds
+                   in cents, so each column keeps one representation.
+    
+    Returns:
+    df: A new DataFrame in the compact storage mode. Its attrs['memory_before_compact'] holds the footprint in bytes before conversion.
+    """
+    
+    memory_before = get_memory_footprint(df)
+    df = df.copy()
+    
+    if cents_columns is None:
+        cents_columns = [column for column in Money_Columns if not df[column].isna().any()]
+    
+    for column in cents_columns:
+        # Round to whole cents first, so values such as 16185.000000001 do not truncate to the wrong cent
+        cents = np.round(df[column].to_numpy() * 100)
+        df[column] = cents.astype(_smallest_int_dtype(cents))
+    
+    df[Units_Sold] = df[Units_Sold].astype(_smallest_int_dtype(df[Units_Sold].to_numpy()))
+    
+    df.attrs['memory_before_compact'] = memory_before
+    
+    return df
+
+
+def cents_to_dollars(table, columns):
+    """
+    Converts the Money Columns among 'columns' of an aggregated table from integer cents back to dollars.
+    
+    Money columns are only integers in the compact storage mode, so tables built from the regular dataset are returned unchanged.
+    
+    Parameters:
+    table: A DataFrame built from the Financials dataset, usually an aggregate.
+    columns: The column names to convert.
+    
+    Returns:
+    table: The DataFrame with those columns in dollars. The input DataFrame is not modified.
+    """
+    
+    cents_columns = [column for column in columns
+                     if column in Money_Columns and pd.api.types.is_integer_dtype(table[column])]
+    
+    if not cents_columns:
+        return table
+    
+    return table.assign(**{column: table[column] / 100 for column in cents_columns})
+
+
+def get_memory_footprint(df):
+    """
+    Returns the memory used by a DataFrame in bytes, including the contents of string columns.
+    """
+    
+    return int(df.memory_usage(deep=True).sum())
+
+#======================================================================================================
+
+def get_tail_state(path, offset):
+    """
+    Records how far a Financials CSV file has been processed, so rows appended later can be read on their own.
+    
+    Parameters:
+    path: The path to the CSV file.
+    offset: The number of bytes of the file that have been parsed.
+    
+    Returns:
+    tail_state: A tuple of the offset, the header line and a hash of the bytes just before the offset.
+    """
+    
+    with open(path, 'rb') as file:
+        header = file.readline()
+        
+        fingerprint_start = max(0, offset - _TAIL_FINGERPRINT_BYTES)
+        file.seek(fingerprint_start)
+        fingerprint = hashlib.sha256(file.read(offset - fingerprint_start)).hexdigest()
+    
+    return (offset, header, fingerprint)
+
+
+def read_appended_financials(path, tail_state, chunksize=None):
+    """
+    Reads and cleans only the rows appended to a Financials CSV file since 'tail_state' was recorded.
+    
+    Only complete lines are parsed, so a row that is still being written is picked up by the next call.
+    
+    Parameters:
+    path: The path to the CSV file.
+    tail_state: The state returned by get_tail_state or by a previous call.
+    chunksize: If given, the appended rows are reduced to totals, as in stream_financials_totals.
+    
+    Returns:
+    appended_df: The cleaned appended rows (or their totals), None if nothing complete was appended, or False if the
+                 bytes before the recorded offset have changed, meaning the file was rewritten rather than appended to.
+    tail_state: The state after these rows.
+    """
+    
+    offset, header, fingerprint = tail_state
+    
+    with open(path, 'rb') as file:
+        # Make sure the part already processed is still the same
+        fingerprint_start = max(0, offset - _TAIL_FINGERPRINT_BYTES)
+        file.seek(fingerprint_start)
+        if hashlib.sha256(file.read(offset - fingerprint_start)).hexdigest() != fingerprint:
+            return False, tail_state
+        
+        appended_bytes = file.read()
+    
+    # Cut after the last line break and keep the rest for the next reload
+    appended_bytes = appended_bytes[:appended_bytes.rfind(b'\n') + 1]
+    if not appended_bytes.strip():
+        return None, tail_state
+    
+    new_tail_state = get_tail_state(path, offset + len(appended_bytes))
+    
+    # The appended rows have no header of their own, so reuse the one at the top of the file
+    appended_df = clean_financials(pd.read_csv(io.BytesIO(header + appended_bytes)))
+    
+    if chunksize:
+        appended_df = _finish_totals(_sum_by_dimensions_and_date(appended_df))
+    
+    return appended_df, new_tail_state
+
+
+def _append_to_cached_financials(cached, cache_key, chunksize, compact):
+    """
+    Brings a cached dataset up to date by reading only the rows appended to its files.
+    
+    Returns the updated DataFrame and the new tail states, plus the cleaned appended rows, or None if any file was
+    rewritten, added or removed, or a Money Column held in cents gets missing values, and the whole dataset has to be
+    reloaded.
+    """
+    
+    old_cache_key, df, tail_states = cached
+    
+    # Incremental reloads only apply when the same files are still there
+    if tail_states is None or [entry[0] for entry in cache_key] != list(tail_states):
+        return None
+    
+    appended_frames = []
+    new_tail_states = {}
+    
+    for (partition_path, file_size, file_mtime_ns), old_entry in zip(cache_key, old_cache_key):
+        tail_state = tail_states[partition_path]
+        
+        # Untouched files have nothing new
+        if (file_size, file_mtime_ns) == old_entry[1:]:
+            new_tail_states[partition_path] = tail_state
+            continue
+        
+        # A file that was modified without growing has been rewritten
+        if file_size <= tail_state[0]:
+            return None
+        
+        appended_df, new_tail_states[partition_path] = read_appended_financials(partition_path, tail_state, chunksize)
+        
+        if appended_df is False:
+            return None
+        if appended_df is not None:
+            appended_frames.append(appended_df)
+    
+    if not appended_frames:
+        return df, new_tail_states, None
+    
+    appended_df = combine_financials_partitions(appended_frames, totals=bool(chunksize))
+    
+    if compact:
+        # Store the appended rows like the cached dataset, so no column mixes integer cents and float dollars
+        cents_columns = [column for column in Money_Columns if pd.api.types.is_integer_dtype(df[column])]
+        
+        # A column held in cents cannot take missing values, so the whole dataset is reloaded and compacted again
+        if appended_df[cents_columns].isna().to_numpy().any():
+            return None
+        
+        appended_df = compact_financials(appended_df, cents_columns)
+    
+    new_df = combine_financials_partitions([df, appended_df], totals=bool(chunksize))
+    
+    if compact:
+        new_df.attrs['memory_before_compact'] = df.attrs['memory_before_compact'] + appended_df.attrs['memory_before_compact']
+    
+    return new_df, new_tail_states, appended_df
+
+
+# Functions called as listener(old_df, new_df, appended_df) after rows appended to the source files have been merged
+# into a cached dataset, so that anything derived from old_df can be updated by delta instead of rebuilt
+_append_listeners = []
+
+
+def add_append_listener(listener):
+    """
+    Registers a function to be called as listener(old_df, new_df, appended_df) after an incremental reload.
+    
+    'appended_df' holds only the new rows (or their totals in the streaming mode) in the same layout as 'new_df'.
+    """
+    
+    _append_listeners.append(listener)
+
+#======================================================================================================
+
+# Process-wide cache of cleaned datasets. Streamlit imports this module once per process, so the
+# entries are shared by every rerun and every session.
+_financials_cache = {}
+_financials_cache_lock = threading.Lock()
+
+
+def load_financials(path=FINANCIALS_CSV, chunksize=FINANCIALS_CHUNKSIZE, compact=FINANCIALS_COMPACT):
+    """
+    Returns the cleaned Financials DataFrame, parsing the CSV files only when they have changed.
+    
+    The source files are expected to be append-only. When a file has grown and the bytes already processed are
+    unchanged, only the appended rows are parsed and merged into the cached DataFrame, and the functions registered
+    with add_append_listener are told about them. Any other change reloads the whole dataset.
+    
+    Parameters:
+    path: A Financials-format CSV file, a directory of partition CSVs or a glob pattern. Defaults to FINANCIALS_CSV.
+    chunksize: If given, the file is streamed in chunks of this many rows and reduced to the totals returned by
+               stream_financials_totals, instead of being loaded row by row. Defaults to FINANCIALS_CHUNKSIZE.
+    compact: If True, the DataFrame is returned in the compact storage mode of compact_financials. Defaults to FINANCIALS_COMPACT.
+    
+    Returns:
+    df: The cleaned DataFrame. It is shared across reruns and sessions and must be treated as read-only.
+    """
+    
+    # Key the cache on the files' identity and state, so an edited, added or removed partition is reloaded on the next rerun
+    path = os.path.abspath(path)
+    paths = get_partition_paths(path)
+    file_stats = [os.stat(partition_path) for partition_path in paths]
+    cache_key = tuple((partition_path, file_stat.st_size, file_stat.st_mtime_ns)
+                      for partition_path, file_stat in zip(paths, file_stats))
+    
+    with _financials_cache_lock:
+        cached = _financials_cache.get((path, chunksize, compact))
+        
+        # Only parse and clean the files when they are new or have changed since the last load
+        if cached is None or cached[0] != cache_key:
+            appended = None
+            
+            # Append-only sources only need their new rows parsed
+            if cached is not None:
+                appended = _append_to_cached_financials(cached, cache_key, chunksize, compact)
+            
+            if appended is not None:
+                df, tail_states, appended_df = appended
+                
+                if appended_df is not None:
+                    for listener in _append_listeners:
+                        listener(cached[1], df, appended_df)
+            else:
+                df = read_financials_partitions(paths, chunksize)
+                
+                if compact:
+                    df = compact_financials(df)
+                
+                # Remember how far each file was read, unless one of them changed while it was being parsed
+                if [os.stat(partition_path).st_size for partition_path in paths] == [entry[1] for entry in cache_key]:
+                    tail_states = {partition_path: get_tail_state(partition_path, file_size)
+                                   for partition_path, file_size, _ in cache_key}
+                else:
+                    tail_states = None
+            
+            cached = (cache_key, df, tail_states)
+            _financials_cache[(path, chunksize, compact)] = cached
+    
+    return cached[1]
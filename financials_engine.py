@@ -0,0 +1,1617 @@
+import io
+import os
+import hashlib
+import sqlite3
+import textwrap
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# DuckDB is optional: the SQL engine uses the sqlite3 module of the standard library without it
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+from financials_data import (load_financials, add_append_listener, add_calendar_columns, cents_to_dollars, get_memory_footprint,
+                             Product, Units_Sold, Date, Year,
+                             Dimension_Columns, Numerical_Columns, Calendar_Columns)
+
+
+# Analytics engine shared by the dashboards and the notebooks.
+#
+# Every function here is pure: it takes the cleaned DataFrame (see load_financials) and the user selections, and returns
+# a table, a string or a matplotlib figure. Nothing in this module touches Streamlit, so the entry points decide how and
+# where to display the results. Matplotlib is only imported by the plotting functions, so callers that only need the
+# tables do not pay for it. The figures are built on matplotlib.figure.Figure rather than pyplot, so pyplot's figure
+# registry never holds them and they are freed like any other object once the caller drops them.
+
+
+# Define a list of complimentary colors for the stacked bar and scatter charts. They are the first colors of the
+# palette, see get_palette
+complimentary_colors = ["#ba2649", "#ffa7ca", "#1a6b54", "#f7d560", "#5c3c92", "#f2a0a1"]
+
+# Number of points above which plot_scatter_chart draws the density of the points instead of every point
+FINANCIALS_SCATTER_DENSITY_ROWS = int(os.environ.get('FINANCIALS_SCATTER_DENSITY_ROWS', 20000))
+
+
+
+#======================================================================================================
+# Aggregation cache
+
+# Cache key of the cube of a dataset, see get_cube
+_CUBE_KEY = ('cube',)
+
+# Engine for the sums of aggregate, the cube and the filters of select_rows. All of them return the same tables:
+#   'kernel': sums on the integer codes of the grouping columns with np.bincount and np.add.at (the default)
+#   'pandas': DataFrame.groupby
+#   'duckdb': SQL on an in-process DuckDB database, or on SQLite when duckdb is not installed
+#   'sqlite': SQL on an in-memory SQLite database
+FINANCIALS_ENGINE = os.environ.get('FINANCIALS_ENGINE', 'kernel')
+_SQL_ENGINES = ('duckdb', 'sqlite')
+
+# Largest number of possible groups, i.e. the product of the numbers of distinct values of the grouping columns, that
+# the kernel engine allocates counters for. Sparser groupings use pandas
+_KERNEL_MAX_GROUPS = 1 << 22
+
+# Byte budget of the aggregation cache. Least recently used tables are evicted once the cached tables use more. The
+# pinned tables (see _PINNED_KINDS) are not counted
+FINANCIALS_CACHE_BYTES = int(os.environ.get('FINANCIALS_CACHE_BYTES', 256 * 2**20))
+
+# Byte budget of the rendered chart cache, see render_chart. Least recently used images are evicted once they use more
+FINANCIALS_CHART_CACHE_BYTES = int(os.environ.get('FINANCIALS_CHART_CACHE_BYTES', 64 * 2**20))
+
+# Aggregated tables shared by every session of the process, keyed on (dataset version, key) and kept in least recently
+# used order. Each entry holds the table, the function of one DataFrame that built it, for tables of sums the grouping
+# columns, and the size of the table in bytes. Tables in the cache are shared and must be treated as read-only.
+_aggregation_cache = OrderedDict()
+_aggregation_cache_bytes = 0
+_pinned_cache_bytes = 0
+
+# Kinds of cached tables that other tables are computed from: the cube every chart pipeline answers from, the SQL
+# databases and the row indexes of the filters. They are pinned outside the byte budget, so a small chart table never
+# evicts a table that is costly to rebuild, and are only dropped with their dataset
+_PINNED_KINDS = frozenset([_CUBE_KEY[0], 'sql_database', 'row_index'])
+_aggregation_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_aggregation_cache_lock = threading.Lock()
+
+# Version of each DataFrame the cache holds tables of, keyed on id(df). Every loaded or derived DataFrame gets a new
+# version, and its tables are dropped after it is garbage collected, so a reloaded dataset starts with an empty cache
+_dataset_versions = {}
+_dataset_version_counter = itertools.count(1)
+
+# Versions of garbage collected DataFrames whose tables are still in the cache. Finalizers only queue the version here:
+# they may run while the lock is held, e.g. when an evicted cube is freed, so the tables are dropped on the next access
+_dropped_versions = []
+
+
+def _forget_dataset(df_id):
+    """
+    Queues the cached tables of a garbage collected DataFrame to be dropped.
+    """
+
+    version = _dataset_versions.pop(df_id, None)
+
+    if version is not None:
+        _dropped_versions.append(version)
+
+
+def get_dataset_version(df):
+    """
+    Returns the version number of a DataFrame in the aggregation cache, assigning a new one on first use.
+    """
+
+    with _aggregation_cache_lock:
+        version = _dataset_versions.get(id(df))
+
+        if version is None:
+            version = _dataset_versions[id(df)] = next(_dataset_version_counter)
+            weakref.finalize(df, _forget_dataset, id(df))
+
+    return version
+
+
+def _is_pinned(cache_key):
+    """
+    Returns whether an entry of the aggregation cache is pinned outside the byte budget, see _PINNED_KINDS.
+    """
+
+    return cache_key[1][0] in _PINNED_KINDS
+
+
+def _remove_aggregations(cache_keys):
+    """
+    Removes entries from the aggregation cache and returns them. Must be called with the lock held, and the returned
+    entries released after it, since freeing a table can run finalizers.
+    """
+
+    global _aggregation_cache_bytes, _pinned_cache_bytes
+
+    removed = []
+    for cache_key in cache_keys:
+        entry = _aggregation_cache.pop(cache_key)
+        removed.append(entry)
+
+        if _is_pinned(cache_key):
+            _pinned_cache_bytes -= entry[3]
+        else:
+            _aggregation_cache_bytes -= entry[3]
+
+    return removed
+
+
+def _purge_dropped_datasets():
+    """
+    Removes the tables of garbage collected DataFrames from the aggregation cache. Must be called with the lock held,
+    see _remove_aggregations.
+    """
+
+    dropped = set()
+    while _dropped_versions:
+        dropped.add(_dropped_versions.pop())
+
+    if not dropped:
+        return []
+
+    return _remove_aggregations([cache_key for cache_key in _aggregation_cache if cache_key[0] in dropped])
+
+
+def _get_table_nbytes(table):
+    """
+    Returns the size in bytes of a cached table: a DataFrame, or a tuple of arrays, indexes and byte counts such as a
+    row index or an SQL database.
+    """
+
+    if isinstance(table, pd.DataFrame):
+        dtypes = table.dtypes
+
+        # Wide tables of numbers, such as pivot tables, are measured without going through every column
+        if all(isinstance(dtype, np.dtype) and dtype.kind in 'biufmM' for dtype in dtypes):
+            return int(table.index.memory_usage(deep=True) + len(table) * sum(dtype.itemsize for dtype in dtypes))
+
+        return get_memory_footprint(table)
+
+    if isinstance(table, tuple):
+        return sum(_get_table_nbytes(part) for part in table)
+
+    if isinstance(table, int):
+        return table
+
+    return getattr(table, 'nbytes', 0)
+
+
+def _store_aggregation(version, key, table, compute, additive_by):
+    """
+    Adds a table to the aggregation cache and evicts the least recently used tables over the byte budget. Must be
+    called with the lock held, see _remove_aggregations.
+    """
+
+    global _aggregation_cache_bytes, _pinned_cache_bytes
+
+    removed = _purge_dropped_datasets()
+
+    cache_key = (version, key)
+    if cache_key in _aggregation_cache:
+        removed += _remove_aggregations([cache_key])
+
+    nbytes = _get_table_nbytes(table)
+    _aggregation_cache[cache_key] = (table, compute, additive_by, nbytes)
+
+    if _is_pinned(cache_key):
+        _pinned_cache_bytes += nbytes
+    else:
+        _aggregation_cache_bytes += nbytes
+
+    # Evict from the least recently used end, skipping the pinned tables. The table just added is kept even when it is
+    # over the budget on its own
+    evicted = []
+    excess = _aggregation_cache_bytes - FINANCIALS_CACHE_BYTES
+    for other_key, entry in _aggregation_cache.items():
+        if excess <= 0 or other_key == cache_key:
+            break
+        if _is_pinned(other_key):
+            continue
+        evicted.append(other_key)
+        excess -= entry[3]
+
+    _aggregation_cache_stats['evictions'] += len(evicted)
+
+    return removed + _remove_aggregations(evicted)
+
+
+def _cached_aggregation(df, key, compute, additive_by=None):
+    """
+    Returns the aggregated table for 'key', calling compute(df) only when it is not in the aggregation cache.
+
+    Parameters:
+    df: The DataFrame the table is computed from.
+    key: A hashable description of the table, e.g. the pipeline name and its arguments.
+    compute: A function of one DataFrame that builds the table from it.
+    additive_by: For a table of sums with one row per group, the grouping columns. Such tables are updated by delta
+                 when rows are appended to the dataset, instead of being dropped.
+
+    Returns:
+    table: The cached or newly computed table.
+    """
+
+    version = get_dataset_version(df)
+
+    with _aggregation_cache_lock:
+        entry = _aggregation_cache.get((version, key))
+
+        if entry is not None:
+            _aggregation_cache.move_to_end((version, key))
+            _aggregation_cache_stats['hits'] += 1
+            return entry[0]
+
+        _aggregation_cache_stats['misses'] += 1
+
+    # Compute outside the lock, so a slow aggregation does not block other sessions
+    table = compute(df)
+
+    with _aggregation_cache_lock:
+        removed = _store_aggregation(version, key, table, compute, additive_by)
+
+    # Evicted tables are only released here, outside the lock
+    del removed
+
+    return table
+
+
+def _get_cached_table(df, key):
+    """
+    Returns the table cached for 'key' without computing it, or None when it is not in the aggregation cache.
+    """
+
+    version = get_dataset_version(df)
+
+    with _aggregation_cache_lock:
+        entry = _aggregation_cache.get((version, key))
+
+    return None if entry is None else entry[0]
+
+
+def _put_cached_table(df, key, table, compute):
+    """
+    Stores a table in the aggregation cache, replacing the table cached for 'key' if any.
+    """
+
+    version = get_dataset_version(df)
+
+    with _aggregation_cache_lock:
+        removed = _store_aggregation(version, key, table, compute, None)
+
+    # Evicted tables are only released here, outside the lock
+    del removed
+
+
+def get_aggregation_cache_stats():
+    """
+    Returns the hit, miss and eviction counters of the aggregation cache, with its number of tables, the size in bytes
+    of the tables counted against the byte budget and of the pinned ones, and its byte budget.
+    """
+
+    with _aggregation_cache_lock:
+        removed = _purge_dropped_datasets()
+        stats = dict(_aggregation_cache_stats, tables=len(_aggregation_cache), bytes=_aggregation_cache_bytes,
+                     pinned_bytes=_pinned_cache_bytes, budget=FINANCIALS_CACHE_BYTES)
+
+    del removed
+
+    return stats
+
+
+def _add_sums(table, appended_table, df, by):
+    """
+    Adds two tables of sums with one row per 'by' group, recoding their labels to the categories of 'df'.
+    """
+
+    # Recode categorical labels to the categories of 'df', which may have grown, and keep the dtype of other labels
+    label_dtypes = {column: df[column].dtype if isinstance(df[column].dtype, pd.CategoricalDtype) else table[column].dtype
+                    for column in by}
+    measures = [column for column in table.columns if column not in by]
+
+    combined = pd.concat([table.astype(label_dtypes), appended_table.astype(label_dtypes)], ignore_index=True)
+
+    # Group the categorical columns on their codes, so groups with a missing label (-1) are kept as the cube keeps
+    # them, which pandas drops for categorical keys even with dropna=False. Sorted codes also put the groups in the
+    # order of the categories, with missing labels first as in build_cube
+    keys = [combined[column].cat.codes.rename(column) if isinstance(dtype, pd.CategoricalDtype) else combined[column]
+            for column, dtype in label_dtypes.items()]
+    summed = combined[measures].groupby(keys, sort=True).sum().reset_index()
+
+    # Decode the codes back into labels, restore the dtypes pandas widens in an index (e.g. int16 years), and keep the
+    # columns in the order of the table
+    for column, dtype in label_dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            summed[column] = pd.Categorical.from_codes(summed[column], dtype=dtype)
+        else:
+            summed[column] = summed[column].astype(dtype)
+
+    return summed[list(table.columns)]
+
+
+def _move_aggregations(old_source, new_source, appended_rows):
+    """
+    Moves the cached tables of sums of 'old_source' to 'new_source', adding the sums of the appended rows to each of them.
+
+    Tables that are not sums are left behind and rebuilt on their next request. The cube's own cached tables are moved
+    along with it. The work depends on the number of appended rows and of groups, not on the size of the dataset.
+    """
+
+    with _aggregation_cache_lock:
+        old_version = _dataset_versions.get(id(old_source))
+        old_entries = [(cache_key[1], entry) for cache_key, entry in _aggregation_cache.items() if cache_key[0] == old_version]
+
+    new_entries = {}
+    for key, (table, compute, additive_by, nbytes) in old_entries:
+        if additive_by is None:
+            continue
+
+        appended_table = compute(appended_rows)
+        new_table = _add_sums(table, appended_table, new_source, additive_by)
+        new_entries[key] = (new_table, compute, additive_by)
+
+        # Tables answered from the cube are updated with the cube of the appended rows
+        if key == _CUBE_KEY:
+            _move_aggregations(table, new_table, appended_table)
+
+    new_version = get_dataset_version(new_source)
+
+    removed = []
+    with _aggregation_cache_lock:
+        for key, (table, compute, additive_by) in new_entries.items():
+            removed += _store_aggregation(new_version, key, table, compute, additive_by)
+
+    del removed
+
+
+def _update_aggregations_for_appended_rows(old_df, new_df, appended_df):
+    """
+    Updates the cached tables of a dataset by delta after rows were appended to its source files (see load_financials).
+    """
+
+    _move_aggregations(old_df, new_df, appended_df)
+
+
+add_append_listener(_update_aggregations_for_appended_rows)
+
+
+def get_dataset():
+    """
+    Returns the cleaned Financials DataFrame shared by every caller in this process (see load_financials).
+    """
+
+    return load_financials()
+
+#======================================================================================================
+# Query
+
+def _build_row_index(df, column):
+    """
+    Builds the inverted index of a column: the positions of the rows holding each distinct value, grouped by value.
+
+    Returns:
+    values: A pandas Index of the distinct values, in code order.
+    positions: The row positions sorted by value, keeping row order within a value.
+    offsets: The positions of the rows holding values[code] are positions[offsets[code]:offsets[code + 1]].
+    """
+
+    # Categorical columns already hold integer codes. Other columns, e.g. the integer 'Year', are factorized
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        codes = df[column].cat.codes.to_numpy()
+        values = df[column].cat.categories
+    else:
+        codes, values = pd.factorize(df[column], sort=True)
+
+    # A stable sort on the codes groups the rows by value. Missing labels (-1) sort first and are skipped by the offsets
+    positions = np.argsort(codes, kind='stable')
+    offsets = np.cumsum(np.bincount(codes.astype(np.int64) + 1, minlength=len(values) + 1))
+
+    return pd.Index(values), positions, offsets
+
+
+def _get_filter_positions(df, column, values):
+    """
+    Returns the sorted positions of the rows of a DataFrame whose 'column' holds one of 'values'.
+
+    The inverted index of the column is built on first use and kept in the aggregation cache, so a filter costs the
+    number of matching rows rather than a scan of the column.
+    """
+
+    index_values, positions, offsets = _cached_aggregation(df, ('row_index', column),
+                                                           lambda frame: _build_row_index(frame, column))
+
+    # OR of the selected values: the row positions of each value are contiguous in the index
+    codes = index_values.get_indexer(list(values))
+    selected = [positions[offsets[code]:offsets[code + 1]] for code in np.unique(codes[codes >= 0])]
+
+    if not selected:
+        return np.empty(0, dtype=np.intp)
+
+    return np.sort(np.concatenate(selected))
+
+
+def select_rows(df, columns, filters=None):
+    """
+    Returns only the columns, and rows, of a DataFrame that a chart needs, without copying the rest of the DataFrame.
+
+    The DataFrame is only read: pipelines query it through this function instead of taking a full df.copy() on every
+    rerun, so the memory allocated per chart depends on the columns and rows it uses, not on the size of the dataset.
+    Filters are answered from an inverted index of each filtered column (see _build_row_index), not with Series.isin.
+
+    Parameters:
+    df: The cleaned Financials DataFrame, its cube (see build_cube) or an aggregated table.
+    columns: The column names to return.
+    filters: A dictionary mapping a column name to the values to keep in it. Rows must match every filter.
+
+    Returns:
+    selection: A DataFrame with the requested columns and the matching rows. It must be treated as read-only.
+    """
+
+    # Without filters, take the requested columns only
+    if not filters:
+        return df[columns]
+
+    # The SQL engines find the matching rows with a query
+    if FINANCIALS_ENGINE in _SQL_ENGINES:
+        return df.iloc[_get_filter_positions_with_sql(df, filters), df.columns.get_indexer(columns)]
+
+    # AND of the filters: mark the rows of one filter in a bitmap, and keep the rows of the next one that are marked
+    rows = None
+    for column, values in filters.items():
+        column_rows = _get_filter_positions(df, column, values)
+
+        if rows is not None:
+            bitmap = np.zeros(len(df), dtype=bool)
+            bitmap[rows] = True
+            column_rows = column_rows[bitmap[column_rows]]
+
+        rows = column_rows
+
+    # Take only the matching rows of the requested columns
+    return df.iloc[rows, df.columns.get_indexer(columns)]
+
+
+def _sum_measures_with_kernel(df, by, measures):
+    """
+    Sums the 'measures' columns of a DataFrame per 'by' group with np.bincount and np.add.at on integer group codes.
+
+    Returns the same table as the pandas path sorted by group, or None when the grouping has too many possible groups.
+    """
+
+    # Integer codes per grouping column: categorical codes as they are, other columns (e.g. 'Date' or 'Year') factorized
+    codes_per_column = []
+    values_per_column = []
+    for column in by:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            codes_per_column.append(df[column].cat.codes.to_numpy())
+            values_per_column.append(None)
+        else:
+            codes, values = pd.factorize(df[column], sort=True)
+            codes_per_column.append(codes)
+            values_per_column.append(values)
+
+    sizes = [len(df[column].cat.categories) if values is None else len(values)
+             for column, values in zip(by, values_per_column)]
+    group_count = int(np.prod(sizes, dtype=np.int64))
+    if group_count > _KERNEL_MAX_GROUPS:
+        return None
+
+    # Combine the codes into one group code per row, in the sort order of the groups. Rows with a missing label (-1)
+    # are dropped, as groupby does
+    group_codes = np.zeros(len(df), dtype=np.int64)
+    missing = None
+    for codes, size in zip(codes_per_column, sizes):
+        group_codes *= size
+        group_codes += codes
+        if len(codes) and codes.min() < 0:
+            missing = codes < 0 if missing is None else missing | (codes < 0)
+
+    keep = None if missing is None else ~missing
+    if keep is not None:
+        group_codes = group_codes[keep]
+
+    # Only the groups holding at least one row are returned, as with observed=True
+    observed = np.flatnonzero(np.bincount(group_codes, minlength=group_count))
+
+    table = {}
+    remaining = observed
+    for column, values, size in reversed(list(zip(by, values_per_column, sizes))):
+        remaining, codes = np.divmod(remaining, size)
+        # pandas widens the factorized values of narrow integer columns (e.g. int16 years), so restore their dtype
+        table[column] = (pd.Categorical.from_codes(codes, dtype=df[column].dtype) if values is None
+                         else values.to_numpy()[codes].astype(df[column].dtype, copy=False))
+
+    for measure in measures:
+        measure_values = df[measure].to_numpy()
+        if keep is not None:
+            measure_values = measure_values[keep]
+
+        if np.issubdtype(measure_values.dtype, np.integer):
+            # Integers, e.g. 'Units Sold' or money in cents, are summed exactly in int64 like groupby does
+            sums = np.zeros(group_count, dtype=np.int64)
+            np.add.at(sums, group_codes, measure_values)
+        else:
+            # Missing amounts count as zero, as in groupby sums. np.bincount returns integers when no row is selected
+            sums = np.bincount(group_codes, weights=np.nan_to_num(measure_values), minlength=group_count)
+            sums = sums.astype(np.float64, copy=False)
+
+        table[measure] = sums[observed]
+
+    return pd.DataFrame({column: table[column] for column in by + measures})
+
+
+def _sum_grouped_column(grouped, column):
+    """
+    Returns the sums of one column of a groupby. Sums of integer columns are int64, as in the kernel and SQL engines,
+    whatever dtype pandas picks for them.
+    """
+
+    sums = grouped[column].sum()
+
+    # Also when no row is selected, as pandas then returns floats
+    if pd.api.types.is_integer_dtype(grouped.obj[column].dtype):
+        sums = sums.astype(np.int64)
+
+    return sums
+
+
+def _sum_measures(df, by, measures, filters=None, sort=True):
+    """
+    Sums the 'measures' columns of a DataFrame per 'by' group, over the rows matching 'filters', in a single pass.
+    """
+
+    # The SQL engines filter and sum in a single query
+    if FINANCIALS_ENGINE in _SQL_ENGINES:
+        return _sum_measures_with_sql(df, by, measures, filters)
+
+    # Read only the grouping keys and measures of the matching rows
+    if filters:
+        df = select_rows(df, by + measures, filters)
+
+    # The kernel engine returns the groups sorted, which also satisfies sort=False
+    if FINANCIALS_ENGINE == 'kernel':
+        table = _sum_measures_with_kernel(df, by, measures)
+        if table is not None:
+            return table
+
+    # The groups are computed once and shared by every measure, and no other column is reduced
+    grouped = df.groupby(by, observed=True, sort=sort)
+    table = pd.DataFrame({measure: _sum_grouped_column(grouped, measure) for measure in measures})
+
+    # pandas returns observed categorical groups in order of appearance, so sort them by category, e.g. so 'Discount
+    # Band' keeps its order
+    if sort:
+        table = table.sort_index()
+
+    table = table.reset_index()
+
+    # Without sorting, pandas also reorders the categories by appearance, so restore the categories of the DataFrame.
+    # astype would not do it, as categorical dtypes with the same categories in another order compare equal. Other
+    # labels get back the dtype pandas widens in an index (e.g. int16 years)
+    for column in by:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            table[column] = table[column].cat.set_categories(df[column].cat.categories)
+        else:
+            table[column] = table[column].astype(df[column].dtype)
+
+    return table
+
+
+def aggregate(df, by, measures, filters=None, sort=True):
+    """
+    Returns the sums of the requested measures per group of the requested keys, computing them on first request.
+
+    Only the requested measures are reduced, and several measures requested together cost a single pass over the data.
+    The sums are computed by the engine selected with FINANCIALS_ENGINE.
+
+    Parameters:
+    df: The cleaned Financials DataFrame, or its cube (see build_cube).
+    by: A list of column names to group by. Categorical keys keep their category order, e.g. for 'Discount Band'.
+    measures: A list of numerical column names to sum.
+    filters: A dictionary mapping a column name to the values to keep in it, applied before summing (see select_rows).
+    sort: Whether to sort the groups. Without sorting they come in order of first appearance, e.g. in date order on the
+          cube, which is presorted by month.
+
+    Returns:
+    table: A DataFrame with the 'by' columns and one column per measure, with one row per group. It is shared through
+           the aggregation cache and must be treated as read-only.
+    """
+
+    by, measures = list(by), list(measures)
+    filters = {column: list(values) for column, values in (filters or {}).items()}
+
+    # Filters are part of the key, and are applied to appended rows too, so the sums stay additive
+    key = ('sum', tuple(by), tuple(measures), tuple((column, tuple(values)) for column, values in filters.items()), sort)
+
+    return _cached_aggregation(df, key, lambda frame: _sum_measures(frame, by, measures, filters, sort), additive_by=by)
+
+#======================================================================================================
+# SQL engines
+
+# Names of the table, the row position column and the month column in the SQL databases
+_SQL_TABLE = 'financials'
+_SQL_ROW = '__row'
+_SQL_MONTH = '__month'
+
+
+def _get_sql_engine():
+    """
+    Returns the SQL engine to use: DuckDB when it is selected and installed, SQLite otherwise.
+    """
+
+    return 'duckdb' if FINANCIALS_ENGINE == 'duckdb' and duckdb is not None else 'sqlite'
+
+
+def _quote(column):
+    """
+    Quotes a column name for SQL, e.g. 'Units Sold'.
+    """
+
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _load_sql_database(df):
+    """
+    Loads a DataFrame into an in-process SQL database.
+
+    Categorical columns are stored as their integer codes and dates as int64 nanoseconds, so both engines group, filter
+    and sort them the same way, with 'Discount Band' in its own order. The position of each row and the first day of
+    the month of its date are stored alongside.
+
+    Returns:
+    connection: The connection to the database, holding the data in the table _SQL_TABLE.
+    lock: A lock to hold while using the connection.
+    nbytes: The approximate size of the data in the database.
+    """
+
+    columns = {}
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            columns[column] = df[column].cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_dtype(df[column].dtype):
+            columns[column] = df[column].to_numpy().view(np.int64)
+        else:
+            columns[column] = df[column].to_numpy()
+
+    if Date in df.columns:
+        columns[_SQL_MONTH] = df[Date].to_numpy().astype('datetime64[M]').astype('datetime64[ns]').view(np.int64)
+    columns[_SQL_ROW] = np.arange(len(df), dtype=np.int64)
+
+    frame = pd.DataFrame(columns)
+
+    if _get_sql_engine() == 'duckdb':
+        # DuckDB scans the registered DataFrame in place, with vectorized and multi-threaded execution
+        connection = duckdb.connect()
+        connection.register(_SQL_TABLE, frame)
+        nbytes = get_memory_footprint(frame)
+    else:
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        frame.to_sql(_SQL_TABLE, connection, index=False)
+        page_count = connection.execute('PRAGMA page_count').fetchone()[0]
+        page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+        nbytes = page_count * page_size
+
+    return connection, threading.Lock(), nbytes
+
+
+def _run_sql(df, query, parameters):
+    """
+    Runs a query on the SQL database of a DataFrame, loading it on first use, and returns the result as a DataFrame.
+
+    The database is kept in the aggregation cache, so it is shared by every session and dropped with the DataFrame.
+    """
+
+    connection, lock, nbytes = _cached_aggregation(df, ('sql_database', _get_sql_engine()), _load_sql_database)
+
+    with lock:
+        if _get_sql_engine() == 'duckdb':
+            return connection.execute(query, parameters).df()
+
+        return pd.read_sql_query(query, connection, params=parameters)
+
+
+def _get_sql_filter(df, filters, conditions=()):
+    """
+    Returns the WHERE clause and its parameters for 'filters', with the labels translated to the stored values.
+    """
+
+    conditions = list(conditions)
+    parameters = []
+
+    for column, values in (filters or {}).items():
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            stored = df[column].cat.categories.get_indexer(list(values))
+            stored = stored[stored >= 0]
+        elif pd.api.types.is_datetime64_dtype(df[column].dtype):
+            stored = pd.to_datetime(list(values)).to_numpy().view(np.int64)
+        else:
+            stored = np.asarray(list(values))
+
+        # An empty selection matches no rows
+        if len(stored) == 0:
+            conditions.append('0 = 1')
+            continue
+
+        conditions.append(f'{_quote(column)} IN ({", ".join("?" * len(stored))})')
+        parameters += stored.tolist()
+
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+    return where, parameters
+
+
+def _get_filter_positions_with_sql(df, filters):
+    """
+    Returns the sorted positions of the rows of a DataFrame matching every filter, see select_rows.
+    """
+
+    where, parameters = _get_sql_filter(df, filters)
+    result = _run_sql(df, f'SELECT {_SQL_ROW} FROM {_SQL_TABLE}{where} ORDER BY {_SQL_ROW}', parameters)
+
+    return result[_SQL_ROW].to_numpy(dtype=np.intp)
+
+
+def _sum_measures_with_sql(df, by, measures, filters=None, by_month=False, dropna=True):
+    """
+    Sums the 'measures' columns of a DataFrame per 'by' group with an SQL query, see aggregate.
+
+    With by_month, rows are grouped on the first day of the month of their date instead of the date. Without dropna,
+    rows with a missing label are kept in their own groups, as in the cube. Groups are returned sorted.
+    """
+
+    keys = [_SQL_MONTH if by_month and column == Date else column for column in by]
+
+    # Integer measures are summed as 64-bit integers, and groups of missing amounts only sum to zero, as with groupby
+    sums = []
+    for measure in measures:
+        if pd.api.types.is_integer_dtype(df[measure].dtype):
+            sums.append(f'CAST(COALESCE(SUM({_quote(measure)}), 0) AS BIGINT) AS {_quote(measure)}')
+        else:
+            sums.append(f'COALESCE(SUM({_quote(measure)}), 0.0) AS {_quote(measure)}')
+
+    # Rows with a missing label have the code -1
+    conditions = [f'{_quote(column)} >= 0' for column in by
+                  if dropna and isinstance(df[column].dtype, pd.CategoricalDtype)]
+    where, parameters = _get_sql_filter(df, filters, conditions)
+
+    select = ', '.join([f'{_quote(key)} AS {_quote(column)}' for key, column in zip(keys, by)] + sums)
+    group = ', '.join(_quote(key) for key in keys)
+    result = _run_sql(df, f'SELECT {select} FROM {_SQL_TABLE}{where} GROUP BY {group} ORDER BY {group}', parameters)
+
+    # Translate the stored values back into labels and dates
+    table = {}
+    for column in by:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            table[column] = pd.Categorical.from_codes(result[column].to_numpy(dtype=np.int64), dtype=df[column].dtype)
+        elif pd.api.types.is_datetime64_dtype(df[column].dtype):
+            table[column] = result[column].to_numpy(dtype=np.int64).view('datetime64[ns]')
+        else:
+            table[column] = result[column].to_numpy(dtype=df[column].dtype)
+
+    for measure in measures:
+        dtype = np.int64 if pd.api.types.is_integer_dtype(df[measure].dtype) else np.float64
+        table[measure] = result[measure].to_numpy(dtype=dtype)
+
+    return pd.DataFrame(table)
+
+#======================================================================================================
+# Cube
+
+def build_cube(df):
+    """
+    Sums every numerical column of a DataFrame over each combination of the Dimension Columns and month.
+
+    Parameters:
+    df: The cleaned Financials DataFrame, or any DataFrame with the same columns.
+
+    Returns:
+    cube: A DataFrame with the same columns as the cleaned dataset and one row per Dimension Columns and month
+          combination, sorted by month. Its 'Date' column holds the first day of the month.
+    """
+
+    # The SQL engines group on the month of each row stored with the data, in the same order as below
+    if FINANCIALS_ENGINE in _SQL_ENGINES:
+        cube = _sum_measures_with_sql(df, [Date] + Dimension_Columns, Numerical_Columns, by_month=True, dropna=False)
+        return add_calendar_columns(cube.reindex(columns=Dimension_Columns + [Date] + Numerical_Columns))
+
+    # Bucket the dates by month, as a month count since the first month of the data
+    months = df[Date].to_numpy().astype('datetime64[M]').astype(np.int64)
+    first_month = months.min() if len(months) else 0
+    months -= first_month
+
+    # Combine the month and the categorical codes into one integer group id, so the DataFrame is grouped on a single
+    # key instead of pandas building a key array per column. The month is the most significant part, so sorted group
+    # ids put the cube in date order. Codes are shifted by one so missing labels (-1) are kept
+    group_ids = months
+    sizes = []
+    for column in Dimension_Columns:
+        sizes.append(len(df[column].cat.categories) + 1)
+        group_ids *= sizes[-1]
+        group_ids += df[column].cat.codes.to_numpy() + 1
+
+    # Sum every numerical column per group id, one column at a time so the numerical block is not copied. The groups
+    # are only computed, and sorted, once and shared by the columns
+    grouped = df.groupby(group_ids, sort=True)
+    cube = pd.DataFrame({column: _sum_grouped_column(grouped, column) for column in Numerical_Columns})
+
+    # Decode the group ids back into the Dimension Columns and the first day of the month
+    remaining = cube.index.to_numpy()
+    labels = {}
+    for column, size in zip(reversed(Dimension_Columns), reversed(sizes)):
+        remaining, codes = np.divmod(remaining, size)
+        labels[column] = pd.Categorical.from_codes(codes - 1, dtype=df[column].dtype)
+    labels[Date] = (remaining + first_month).astype('datetime64[M]').astype('datetime64[ns]')
+
+    cube = pd.DataFrame({column: labels[column] for column in Dimension_Columns + [Date]}).join(cube.reset_index(drop=True))
+
+    return add_calendar_columns(cube)
+
+
+def get_cube(df):
+    """
+    Returns the cube of a dataset (see build_cube), building it on first use.
+
+    Every chart pipeline answers from the cube, so their cost depends on the number of distinct groups rather than on
+    the number of rows. The cube is kept in the aggregation cache and updated by delta when rows are appended.
+    """
+
+    # The date leads the grouping columns, so the cube stays sorted by month after rows are appended
+    return _cached_aggregation(df, _CUBE_KEY, build_cube, additive_by=[Date] + Dimension_Columns + Calendar_Columns)
+
+#======================================================================================================
+# Getting Unique Items in DataFrame
+
+def get_unique_items_list_in_column(df, column_name):
+    """
+    Returns a list of unique items in the specified column of DataFrame 'df'.
+
+    Parameters:
+    df: The cleaned Financials DataFrame.
+    column_name: The name of the column to retrieve unique items from.
+
+    Returns:
+    full_list: A list of unique items in the specified column. The list is sorted if the column name is not 'Discount_Band' or 'Date'. If the column name is 'Date', the list contains unique years.
+    """
+
+    # Check if the column is one of the categorical Dimension Columns
+    if column_name in Dimension_Columns:
+        # The categories are built at load time, sorted and with 'Discount Band' in its own order, so no scan of the data is needed
+        full_list = df[column_name].cat.categories.tolist()
+
+    # Check if the column name is 'Date'
+    elif column_name == Date:
+        # Get a list of unique years from the precomputed integer 'Year' column and sort it
+        full_list = df[Year].unique().tolist()
+        full_list = sorted(full_list)
+
+    else:
+        # Get a list of unique items in the specified column
+        full_list = df[column_name].unique().tolist()
+
+    return full_list
+
+
+def get_year_as_String(year_considered):
+    # Convert the year_considered list to a string
+    year_list_str = ', '.join(map(str, year_considered))
+
+    return year_list_str
+
+#======================================================================================================
+# Pipelines
+
+def _build_bar_table(df, x_axis, y_axis):
+    """
+    Builds the bar chart table, see create_bar_table.
+    """
+
+    # Sum only the y-axis per x-axis item. The x-axis is categorical, so 'Discount Band' keeps its order
+    bar_df = aggregate(get_cube(df), [x_axis], [y_axis])
+
+    # Show money totals in dollars when the dataset is kept in integer cents
+    return cents_to_dollars(bar_df, [y_axis])
+
+
+def create_bar_table(df, x_axis, y_axis):
+    """
+    Generates a table for a bar chart.
+
+    Parameters:
+    df: The cleaned Financials DataFrame.
+    x_axis: The column name to use as the x-axis.
+    y_axis: The column name to use as the y-axis.
+
+    Returns:
+    bar_df: A dataframe containing the data for the bar chart.
+    """
+
+    # The table is memoized per selection and dataset version, so flipping back to a previous selection reuses it
+    return _cached_aggregation(df, ('bar_table', x_axis, y_axis),
+                               lambda frame: _build_bar_table(frame, x_axis, y_axis))
+
+
+def get_differentiating_color(bar_df, y_axis, value):
+    """
+    Returns a color based on the value of a bar in a bar chart.
+
+    Each call scans the y-axis column, so use get_bar_highlights to color every bar of a chart.
+
+    Parameters:
+    bar_df: The dataframe containing the data for the bar chart.
+    y_axis: The column name to use as the y-axis.
+    value: The value of the bar to get the color for.
+
+    Returns:
+    color: A string representing the color of the bar. 'royalblue' if the value is the maximum value in the y-axis column, 'red' if it is the minimum value, and 'gray' otherwise.
+    """
+
+    # Check if the value is the maximum or minimum value in the y-axis column
+    if value == bar_df[y_axis].max():
+        return 'royalblue'
+    elif value == bar_df[y_axis].min():
+        return 'red'
+    else:
+        return 'gray'
+
+
+def _format_min_max_report(bar_x_axis, bar_y_axis, max_value, max_category, min_value, min_category):
+    """
+    Writes the report on the minimum and maximum bars, see get_report_on_min_max_bar_values.
+    """
+
+    # Format the maximum and minimum values as strings with thousands separators
+    formatted_max_value = format(max_value, ',')
+    formatted_min_value = format(min_value, ',')
+
+    # Check if the y-axis is 'Units Sold'
+    if bar_y_axis == Units_Sold:
+        # Generate a report for 'Units Sold'
+        report = f'#### The {bar_x_axis}  **\"{max_category}\"** has the highest Total {bar_y_axis} value of :green[**{formatted_max_value}**] units. The lowest is **\"{min_category}\"** with a value of :red[**{formatted_min_value}**] units.'
+
+    else:
+        # Generate a report for other y-axis values
+        report = f'#### The {bar_x_axis} **\"{max_category}\"** has the highest Total {bar_y_axis} value of :green[**\${formatted_max_value}**]. The lowest is **\"{min_category}\"** with a value of :red[**\${formatted_min_value}**]'
+
+    # Check if the maximum and minimum values are equal
+    if max_value == min_value:
+        # Generate a report for equal values
+        report = f'#### The Total {bar_y_axis} is the same across all The {bar_x_axis} with a value of :green[**\${formatted_min_value}**].'
+
+    return report
+
+
+def get_bar_highlights(bar_df, bar_x_axis, bar_y_axis):
+    """
+    Returns the colors of the bars and the report on the minimum and maximum values of a bar chart together.
+
+    The maximum and minimum are located once with argmax/argmin and the colors are assigned in one vectorized step, so
+    the cost stays linear in the number of bars (see get_differentiating_color and get_report_on_min_max_bar_values).
+
+    Parameters:
+    bar_df: The dataframe containing the data for the bar chart.
+    bar_x_axis: The column name to use as the x-axis.
+    bar_y_axis: The column name to use as the y-axis.
+
+    Returns:
+    colors: A list with one color per bar: 'royalblue' for the maximum value, 'red' for the minimum and 'gray' otherwise.
+    report: A string containing a report on the minimum and maximum values in the y-axis column of the dataframe.
+    """
+
+    values = bar_df[bar_y_axis].to_numpy()
+
+    # Locate the first bar with the maximum and with the minimum value
+    max_position = values.argmax()
+    min_position = values.argmin()
+    max_value = values[max_position]
+    min_value = values[min_position]
+
+    # The maximum wins when a bar is both, i.e. when every bar has the same value
+    colors = np.where(values == max_value, 'royalblue', np.where(values == min_value, 'red', 'gray')).tolist()
+
+    # Get the categories associated with the maximum and minimum values
+    categories = bar_df[bar_x_axis]
+    report = _format_min_max_report(bar_x_axis, bar_y_axis, max_value, categories.iloc[max_position],
+                                    min_value, categories.iloc[min_position])
+
+    return colors, report
+
+
+def get_report_on_min_max_bar_values(bar_df, bar_x_axis, bar_y_axis):
+    """
+    Generates a report on the minimum and maximum values in a bar chart.
+
+    Parameters:
+    bar_df: The dataframe containing the data for the bar chart.
+    bar_x_axis: The column name to use as the x-axis.
+    bar_y_axis: The column name to use as the y-axis.
+
+    Returns:
+    report: A string containing a report on the minimum and maximum values in the y-axis column of the dataframe.
+    """
+
+    # The report is computed along with the colors in a single pass, see get_bar_highlights
+    return get_bar_highlights(bar_df, bar_x_axis, bar_y_axis)[1]
+
+#======================================================================================================
+
+def _get_pivot_index(cube, index):
+    """
+    Returns every possible index value of a pivot table on the cube: all the categories of a categorical column, or
+    the distinct values of another column (e.g. the months of 'Date') sorted.
+    """
+
+    if isinstance(cube[index].dtype, pd.CategoricalDtype):
+        return pd.CategoricalIndex(cube[index].cat.categories, dtype=cube[index].dtype, name=index)
+
+    return _cached_aggregation(cube, ('pivot_index', index), lambda frame: pd.Index(np.sort(frame[index].unique()), name=index))
+
+
+def _sum_items(cube, index, item_column, items, y_axis, filters, sort):
+    """
+    Returns the sums of the items per index value as an array with one row per value of _get_pivot_index and one
+    column per item, NaN where an item has no rows, and the dtype of the sums.
+    """
+
+    # One aggregate over every item, rather than one per item. When the items are also the index, e.g. products per
+    # product, each item only has a value at its own index value
+    by = [index] if index == item_column else [index, item_column]
+    sums = aggregate(cube, by, [y_axis], filters=dict(filters, **{item_column: items}), sort=sort)
+    sums = cents_to_dollars(sums, [y_axis])
+
+    pivot_index = _get_pivot_index(cube, index)
+    values = np.full((len(pivot_index), len(items)), np.nan)
+    values[pivot_index.get_indexer(sums[index]),
+           pd.Index(items).get_indexer(sums[item_column].to_numpy(dtype=object))] = sums[y_axis].to_numpy()
+
+    return values, sums[y_axis].dtype
+
+
+def _pivot_item_partials(cube, index, item_column, items, y_axis, filters=None, sort=True):
+    """
+    Builds a pivot table with one column per selected item, reusing the sums of the last selection of the same pivot.
+
+    The sums of the selected items are kept in the aggregation cache, aligned on all the possible index values, so
+    adding items to a multiselect only sums the rows of the items added, in one aggregate, and removing items only
+    drops their columns. The pivot table is assembled in O(index values x items).
+
+    Parameters:
+    cube: The cube of the dataset (see get_cube).
+    index: The column name to use as the index of the pivot table.
+    item_column: The column name holding the items, e.g. 'Product'. One column of the pivot table per item.
+    items: The selected items. Items without rows are left out, as in DataFrame.pivot.
+    y_axis: The column name of the values to sum.
+    filters: Further filters applied before summing, see aggregate.
+    sort: Whether aggregate sorts the groups, see aggregate. The pivot table is sorted either way.
+
+    Returns:
+    pivot: A dataframe with one row per index value and one column per item, both in category order.
+    """
+
+    filters = {column: list(values) for column, values in (filters or {}).items()}
+    filters_key = tuple((column, tuple(values)) for column, values in filters.items())
+
+    # The selected items in the order of the categories, without duplicates
+    selected = set(items)
+    items = [item for item in cube[item_column].cat.categories if item in selected]
+
+    # The sums of the last selection of this pivot: its items, one column of sums per item and their dtype
+    partials_key = ('item_partials', index, item_column, y_axis, filters_key, sort)
+    previous = _get_cached_table(cube, partials_key)
+
+    if previous is None:
+        values, dtype = _sum_items(cube, index, item_column, items, y_axis, filters, sort)
+    else:
+        previous_items, previous_values, dtype = previous
+
+        # Reuse the columns of the items that were already selected, and sum the added items together
+        positions = previous_items.get_indexer(items)
+        reused = positions >= 0
+        values = np.empty((len(previous_values), len(items)))
+        values[:, reused] = previous_values[:, positions[reused]]
+
+        if not reused.all():
+            added = [item for item, position in zip(items, positions) if position < 0]
+            values[:, ~reused], dtype = _sum_items(cube, index, item_column, added, y_axis, filters, sort)
+
+    # Replace the last selection with this one, so the next change of the selection is computed against it
+    _put_cached_table(cube, partials_key, (pd.Index(items, dtype=object), values, dtype),
+                      lambda frame: (pd.Index(items, dtype=object),) + _sum_items(frame, index, item_column, items,
+                                                                                  y_axis, filters, sort))
+
+    pivot_index = _get_pivot_index(cube, index)
+
+    # Items without rows are left out
+    has_item_rows = ~np.isnan(values).all(axis=0)
+    values = values[:, has_item_rows]
+    columns = [item for item, has_rows in zip(items, has_item_rows) if has_rows]
+
+    # Keep the index values where at least one item has rows, and count the others as zero
+    has_rows = ~np.isnan(values).all(axis=1)
+    values = values[has_rows]
+    missing = np.isnan(values)
+    values[missing] = 0
+
+    # Counts such as 'Units Sold' stay integers when every item has rows for every index value, as with pivot
+    if columns and not missing.any() and pd.api.types.is_integer_dtype(dtype):
+        values = values.astype(dtype)
+
+    return pd.DataFrame(values, index=pivot_index[has_rows],
+                        columns=pd.CategoricalIndex(columns, dtype=cube[item_column].dtype, name=item_column))
+
+
+def _build_stacked_bar_table(df, x_axis, y_axis, product_List):
+    """
+    Builds the stacked bar chart pivot table, see create_stacked_bar_table.
+    """
+
+    # One column per product in product_List, summed in one aggregate, so changing the selected products only sums the
+    # products added. Both axes are in category order, e.g. so 'Discount Band' keeps its order
+    return _pivot_item_partials(get_cube(df), x_axis, Product, product_List, y_axis)
+
+
+def create_stacked_bar_table(df, x_axis, y_axis, product_List):
+    """
+    Generates the pivot table behind the stacked bar chart.
+
+    Parameters:
+    df: The cleaned Financials DataFrame.
+    x_axis: The column name to use as the x-axis. It should not be 'Product', which is already the stacking column.
+    y_axis: The column name to use as the y-axis.
+    product_List: A list of products to include in the chart.
+
+    Returns:
+    products_df_pivot: A dataframe with one row per x-axis item and one column per product.
+    """
+
+    # The table is memoized per selection and dataset version, so flipping back to a previous selection reuses it
+    return _cached_aggregation(df, ('stacked_bar_table', x_axis, y_axis, tuple(product_List)),
+                               lambda frame: _build_stacked_bar_table(frame, x_axis, y_axis, product_List))
+
+
+def _build_bump_table(df, y_axis, categorical_label, year_considered, categorical_label_list):
+    """
+    Builds the bump chart pivot table, see create_bump_table.
+    """
+
+    # One column per item in categorical_label_list, summed in one aggregate, so changing the selected items only sums
+    # the items added. Only the rows of the cube in year_considered are read, and the cube is sorted by month, so the
+    # groups come out in date order without a sort
+    bump_df_pivot = _pivot_item_partials(get_cube(df), Date, categorical_label, categorical_label_list, y_axis,
+                                         filters={Year: year_considered}, sort=False)
+
+    # Format the dates to only include the month and day
+    bump_df_pivot.index = bump_df_pivot.index.strftime('%d-%m %Y')
+
+    return bump_df_pivot
+
+
+def create_bump_table(df, y_axis, categorical_label, year_considered, categorical_label_list):
+    """
+    Generates the pivot table behind the bump chart.
+
+    Parameters:
+    df: The cleaned Financials DataFrame.
+    y_axis: The column name to use as the y-axis.
+    categorical_label: The column name to use as the categorical label.
+    year_considered: A list of years to include in the chart.
+    categorical_label_list: A list of categorical labels to include in the chart.
+
+    Returns:
+    bump_df_pivot: A dataframe with one row per date, indexed by the date formatted as 'dd-mm yyyy', and one column per categorical label.
+    """
+
+    # The table is memoized per selection and dataset version, so flipping back to a previous selection reuses it
+    return _cached_aggregation(df, ('bump_table', y_axis, categorical_label, tuple(year_considered), tuple(categorical_label_list)),
+                               lambda frame: _build_bump_table(frame, y_axis, categorical_label, year_considered, categorical_label_list))
+
+
+def _build_scatter_table(df, x_axis, y_axis, Dimension_category, Dimension_subcategory_list):
+    """
+    Builds the scatter chart table, see create_scatter_table.
+    """
+
+    # Query the cube of the dataset for the x-axis, y-axis and Dimension_category columns of the subcategories in Dimension_subcategory_list
+    scatter_df_filtered = select_rows(get_cube(df), [x_axis, y_axis, Dimension_category],
+                                      {Dimension_category: Dimension_subcategory_list})
+    scatter_df_filtered = cents_to_dollars(scatter_df_filtered, [x_axis, y_axis])
+
+    # Sort the data by Dimension_category
+    scatter_df_filtered = scatter_df_filtered.sort_values(by=Dimension_category)
+
+    return scatter_df_filtered
+
+
+def create_scatter_table(df, x_axis, y_axis, Dimension_category, Dimension_subcategory_list):
+    """
+    Generates the table behind the scatter chart.
+
+    Each point is one cell of the cube (see build_cube), i.e. the totals of one Segment, Country, Product, Discount Band
+    and month combination, so the number of points does not grow with the number of rows.
+
+    Parameters:
+    df: The cleaned Financials DataFrame.
+    x_axis: The column name to use as the x-axis.
+    y_axis: The column name to use as the y-axis.
+    Dimension_category: The column name to use as the category for coloring the points.
+    Dimension_subcategory_list: A list of subcategories to include in the chart.
+
+    Returns:
+    scatter_df_filtered: A dataframe with the x-axis, y-axis and Dimension_category columns, sorted by Dimension_category.
+    """
+
+    # The table is memoized per selection and dataset version, so flipping back to a previous selection reuses it
+    return _cached_aggregation(df, ('scatter_table', x_axis, y_axis, Dimension_category, tuple(Dimension_subcategory_list)),
+                               lambda frame: _build_scatter_table(frame, x_axis, y_axis, Dimension_category, Dimension_subcategory_list))
+
+#======================================================================================================
+# Figures
+
+def _can_update_bar_chart(fig, bar_x_axis, tick_labels):
+    """
+    Returns whether a figure of plot_bar_chart has the same x-axis as a new bar chart, so its bars can be updated.
+    """
+
+    if fig is None or len(fig.axes) != 1:
+        return False
+
+    ax = fig.axes[0]
+
+    return (ax.get_xlabel() == bar_x_axis and len(ax.containers) == 1 and len(ax.containers[0]) == len(tick_labels)
+            and [label.get_text() for label in ax.get_xticklabels()] == tick_labels)
+
+
+def plot_bar_chart(bar_df, bar_x_axis, bar_y_axis, colors, fig=None):
+    """
+    Plots a bar chart using Matplotlib.
+
+    Parameters:
+    bar_df: The dataframe containing the data for the bar chart.
+    bar_x_axis: The column name to use as the x-axis.
+    bar_y_axis: The column name to use as the y-axis.
+    colors: A list of colors to use for each bar in the chart.
+    fig: Optional. A figure returned by plot_bar_chart before. When it has the same bars on the x-axis, e.g. only the
+         y-axis changed, its bar heights, colors, y-axis label and limits are updated in place instead of building a
+         new figure, so the axes and the tick label layout are reused.
+
+    Returns:
+    fig: The Matplotlib figure.
+    """
+    from matplotlib.figure import Figure
+    import matplotlib.ticker as ticker
+
+    # Wrap the x-axis tick labels
+    tick_labels = [textwrap.fill(label, 10) for label in bar_df[bar_x_axis]]
+
+    if _can_update_bar_chart(fig, bar_x_axis, tick_labels):
+        ax = fig.axes[0]
+
+        # Update the bars of the previous chart and rescale the y-axis to the new heights
+        for bar, height, color in zip(ax.containers[0], bar_df[bar_y_axis], colors):
+            bar.set_height(height)
+            bar.set_facecolor(color)
+        ax.set_ylabel(bar_y_axis)
+        ax.relim()
+        ax.autoscale_view()
+
+        return fig
+
+    # Create a bar chart using Matplotlib, outside of pyplot so the figure is freed once it is no longer used
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.bar(bar_df[bar_x_axis], bar_df[bar_y_axis],  color= colors,)
+    ax.set_xlabel(bar_x_axis)
+    ax.set_ylabel(bar_y_axis)
+
+    # Set the y-axis ticks to display as real numbers instead of scientific notation
+    ax.yaxis.set_major_formatter(ticker.FormatStrFormatter('%.0f'))
+
+    # Set the x-axis ticks and the wrapped tick labels
+    ax.set_xticks(range(len(bar_df[bar_x_axis])))
+    ax.set_xticklabels(tick_labels, fontsize=9)
+
+    for label in ax.get_xticklabels():
+        label.set_fontweight('bold')
+
+    return fig
+
+
+def plot_stacked_bar_chart(products_df_pivot):
+    """
+    Plots a stacked bar chart using Pandas.
+
+    Parameters:
+    products_df_pivot: The pivot table returned by create_stacked_bar_table.
+
+    Returns:
+    fig: The Matplotlib figure.
+    """
+    from matplotlib.figure import Figure
+    import matplotlib.ticker as ticker
+
+    # Create a stacked bar chart using Pandas, on the axes of a figure outside of pyplot, with one color per product
+    fig = Figure(figsize=(8, 5))
+    palette = [tuple(color) for color in get_palette(len(products_df_pivot.columns))]
+    chart = products_df_pivot.plot(kind='bar', stacked=True, color=palette, ax=fig.subplots())
+
+    # Set the y-axis ticks to display as real numbers instead of scientific notation
+    chart.yaxis.set_major_formatter(ticker.FormatStrFormatter('%.0f'))
+
+    # Wrap the x-axis tick labels
+    tick_labels = [textwrap.fill(label, 10) for label in products_df_pivot.index]
+
+    # Set the x-axis ticks and tick labels
+    chart.set_xticks(range(len(products_df_pivot.index)))
+    chart.set_xticklabels(tick_labels, fontsize=9)
+
+    # Set the font weight of the x-axis tick labels to bold
+    for label in chart.get_xticklabels():
+        label.set_fontweight('bold')
+
+    # Set the rotation of the x-axis tick labels to 0 degrees
+    chart.set_xticklabels(chart.get_xticklabels(), rotation=0)
+
+    return fig
+
+
+def plot_bump_chart(bump_df_pivot):
+    """
+    Plots a bump chart using Matplotlib.
+
+    Parameters:
+    bump_df_pivot: The pivot table returned by create_bump_table.
+
+    Returns:
+    fig: The Matplotlib figure.
+    """
+    from matplotlib.figure import Figure
+
+    # Create a line chart using matplotlib, outside of pyplot so the figure is freed once it is no longer used
+    fig = Figure(figsize=(6, 3))
+    ax = fig.subplots()
+    for column in bump_df_pivot.columns:
+        ax.plot(bump_df_pivot.index, bump_df_pivot[column], label=column)
+        ax.scatter(bump_df_pivot.index, bump_df_pivot[column])
+
+    # Wrap the x-axis tick labels
+    tick_labels = [textwrap.fill(label, 5) for label in bump_df_pivot.index]
+    ax.set_xticks(bump_df_pivot.index)
+    ax.set_xticklabels(tick_labels, fontsize=7)
+    ax.set_xticklabels(ax.get_xticklabels(),fontsize=9, rotation=0)
+
+    fig.legend(ncol=1, loc='right', bbox_to_anchor=(1.2,0.7))
+
+    return fig
+
+
+def get_palette(n_colors):
+    """
+    Returns n_colors distinct colors for the categories of a chart: complimentary_colors first, then colors with hues
+    a golden angle apart, so any number of subcategories gets its own color.
+
+    Parameters:
+    n_colors: The number of colors.
+
+    Returns:
+    palette: An array with one RGBA color per row.
+    """
+    import matplotlib.colors as mcolors
+
+    palette = mcolors.to_rgba_array(complimentary_colors[:n_colors])
+
+    # Colors beyond complimentary_colors, alternating the saturation and the brightness between neighbours
+    extra = np.arange(max(n_colors - len(complimentary_colors), 0))
+    hsv = np.column_stack([(0.1 + extra * 0.381966) % 1,
+                           np.where(extra % 2 == 0, 0.75, 0.5),
+                           np.where(extra % 3 == 0, 0.6, 0.85)])
+
+    return np.vstack([palette, np.column_stack([mcolors.hsv_to_rgb(hsv), np.ones(len(extra))])])
+
+
+def _draw_scatter_density(ax, x, y, codes, category_colors, dpi=200):
+    """
+    Draws the points of a scatter chart as an image of their density, with one bin per pixel of the axes in an image
+    saved at 'dpi'.
+
+    Each bin is colored with the mean color of its points, i.e. the colors of the categories weighted by their counts,
+    and is more opaque the more points it holds (on a log scale). The counts and the color sums are accumulated per bin
+    with np.bincount, so the memory used depends on the size of the axes, not on the number of points or categories.
+
+    Parameters:
+    ax: The Matplotlib axes to draw on.
+    x, y: Arrays with the coordinates of the points.
+    codes: An array with the position of the category of each point in category_colors, -1 to leave the point out.
+    category_colors: An array with one RGBA color per category.
+    dpi: The resolution the figure is saved at, 200 as with render_chart and st.pyplot.
+    """
+
+    # Leave out points without a category or without coordinates
+    keep = (codes >= 0) & np.isfinite(x) & np.isfinite(y)
+    x, y, codes = x[keep], y[keep], codes[keep]
+
+    if len(x) == 0:
+        return
+
+    # One bin per pixel of the axes once saved. The axes are measured at the figure's own resolution, 100 dpi by default
+    scale = dpi / ax.figure.dpi
+    width, height = max(int(ax.bbox.width * scale), 1), max(int(ax.bbox.height * scale), 1)
+    x_min, x_max = x.min(), x.max()
+    y_min, y_max = y.min(), y.max()
+    if x_max == x_min:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    if y_max == y_min:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+
+    x_bins = np.minimum(((x - x_min) / (x_max - x_min) * width).astype(np.int64), width - 1)
+    y_bins = np.minimum(((y - y_min) / (y_max - y_min) * height).astype(np.int64), height - 1)
+    bins = y_bins * width + x_bins
+
+    # Points per bin, and the sums of their red, green and blue components
+    total = np.bincount(bins, minlength=height * width)
+    image = np.zeros((height * width, 4))
+    for channel in range(3):
+        image[:, channel] = np.bincount(bins, weights=category_colors[codes, channel], minlength=height * width)
+
+    # Mix the category colors by their counts in each bin, and make fuller bins more opaque
+    image[:, :3] /= np.maximum(total, 1)[:, np.newaxis]
+    image[:, 3] = np.where(total > 0, 0.35 + 0.65 * np.log1p(total) / np.log1p(total.max()), 0)
+
+    ax.imshow(image.reshape(height, width, 4), origin='lower', extent=(x_min, x_max, y_min, y_max), aspect='auto',
+              interpolation='nearest')
+
+
+def plot_scatter_chart(scatter_df_filtered, x_axis, y_axis, Dimension_category, Dimension_subcategory_list, density=None):
+    """
+    Plots a scatter chart using Matplotlib.
+
+    Parameters:
+    scatter_df_filtered: The table returned by create_scatter_table.
+    x_axis: The column name to use as the x-axis.
+    y_axis: The column name to use as the y-axis.
+    Dimension_category: The column name to use as the category for coloring the points.
+    Dimension_subcategory_list: A list of subcategories to include in the chart.
+    density: Optional. Whether to draw the density of the points instead of every point. By default, the density is
+             drawn when the table has more than FINANCIALS_SCATTER_DENSITY_ROWS rows.
+
+    Returns:
+    fig: The Matplotlib figure.
+    """
+    from matplotlib.figure import Figure
+    import matplotlib.ticker as ticker
+
+    # One color per subcategory, and the position of the subcategory of each point (-1 for others), so the colors of
+    # the points are looked up in one step instead of one at a time
+    subcategories = list(dict.fromkeys(Dimension_subcategory_list))
+    palette = get_palette(len(subcategories))
+    codes = pd.Categorical(scatter_df_filtered[Dimension_category], categories=subcategories).codes.astype(np.int64)
+
+    if density is None:
+        density = len(scatter_df_filtered) > FINANCIALS_SCATTER_DENSITY_ROWS
+
+    # Create a scatter chart using Matplotlib, outside of pyplot so the figure is freed once it is no longer used
+    fig = Figure(figsize=(5,3))
+    ax = fig.subplots()
+
+    if density:
+        _draw_scatter_density(ax, scatter_df_filtered[x_axis].to_numpy(dtype=float),
+                              scatter_df_filtered[y_axis].to_numpy(dtype=float), codes, palette)
+    else:
+        # Plot the points of the selected subcategories, colored from the palette
+        shown = codes >= 0
+        ax.scatter(scatter_df_filtered[x_axis][shown], scatter_df_filtered[y_axis][shown], color=palette[codes[shown]])
+
+    # Set the x-axis ticks to display as real numbers instead of scientific notation
+    ax.xaxis.set_major_formatter(ticker.FormatStrFormatter('%.f'))
+    ax.set_xticklabels(ax.get_xticklabels(),fontsize = 7, rotation= 0)
+
+    # Add a legend to the chart, from empty scatters on the chart's own axes. They hold no points, so the limits are
+    # settled first and not recomputed over every previous scatter as each one is added
+    ax.autoscale_view()
+    ax.set_autoscale_on(False)
+    for parts, color in zip(subcategories, palette):
+        ax.scatter([], [], color=color, label=parts)
+
+    fig.legend(bbox_to_anchor=(0.9, 0.5), loc='lower left',  ncol=1)
+
+    return fig
+
+
+
+#======================================================================================================
+# Rendered charts
+
+# Rendered images shared by every session of the process, keyed on the plotting function, its arguments and the image
+# options, and kept in least recently used order
+_chart_cache = OrderedDict()
+_chart_cache_bytes = 0
+_chart_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+_chart_cache_lock = threading.Lock()
+
+
+def _get_chart_key(value):
+    """
+    Returns a hashable description of an argument of a plotting function. Tables are described by a hash of their
+    index and values along with their labels and dtypes, so an equal table rebuilt from scratch gets the same key.
+    """
+
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes(), digest_size=16)
+
+        return ('table', value.index.name, value.columns.name, tuple(value.columns), tuple(map(str, value.dtypes)),
+                digest.hexdigest())
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_get_chart_key(item) for item in value)
+
+    return value
+
+
+def render_chart(plot_function, *args, format='png', dpi=200, figures=None):
+    """
+    Returns the image of a chart, calling plot_function and rasterizing the figure only when an equal chart is not in
+    the rendered chart cache.
+
+    Parameters:
+    plot_function: One of the plot_* functions, e.g. plot_bar_chart.
+    *args: The arguments of plot_function: the table to plot and the styling parameters.
+    format: The image format, 'png' or 'svg'.
+    dpi: The resolution of the image, 200 as with st.pyplot.
+    figures: Optional. A dict keeping the last figure of plot_bar_chart between calls, e.g. in st.session_state, so a
+             new bar chart updates that figure in place (see plot_bar_chart). Not part of the cache key.
+
+    Returns:
+    image: The bytes of the image, to display with st.image.
+    """
+
+    global _chart_cache_bytes
+
+    key = (plot_function.__name__, _get_chart_key(args), format, dpi)
+
+    with _chart_cache_lock:
+        image = _chart_cache.get(key)
+
+        if image is not None:
+            _chart_cache.move_to_end(key)
+            _chart_cache_stats['hits'] += 1
+            return image
+
+        _chart_cache_stats['misses'] += 1
+
+    # Rasterize with the options of st.pyplot. The figures of the plot_* functions are not registered with pyplot, so
+    # the figure is freed as soon as the image is taken, unless it is the bar chart kept in 'figures' for the next call
+    buffer = io.BytesIO()
+    if figures is not None and plot_function is plot_bar_chart:
+        fig = figures[plot_function.__name__] = plot_function(*args, fig=figures.get(plot_function.__name__))
+    else:
+        fig = plot_function(*args)
+    fig.savefig(buffer, format=format, dpi=dpi, bbox_inches='tight')
+    image = buffer.getvalue()
+
+    with _chart_cache_lock:
+        if key not in _chart_cache:
+            _chart_cache[key] = image
+            _chart_cache_bytes += len(image)
+
+        # Evict from the least recently used end. The image just added is kept even when over the budget on its own
+        while _chart_cache_bytes > FINANCIALS_CHART_CACHE_BYTES and len(_chart_cache) > 1:
+            _, evicted = _chart_cache.popitem(last=False)
+            _chart_cache_bytes -= len(evicted)
+            _chart_cache_stats['evictions'] += 1
+
+    return image
+
+
+def get_chart_cache_stats():
+    """
+    Returns the hit, miss and eviction counters of the rendered chart cache, with its number of images, its size in
+    bytes and its byte budget.
+    """
+
+    with _chart_cache_lock:
+        return dict(_chart_cache_stats, images=len(_chart_cache), bytes=_chart_cache_bytes,
+                    budget=FINANCIALS_CHART_CACHE_BYTES)
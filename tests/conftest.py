@@ -0,0 +1,36 @@
+import csv
+import io
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the root of the repository, next to the Streamlit apps
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FINANCIALS_CSV = os.path.join(ROOT, 'Financials.csv')
+
+
+@pytest.fixture
+def financials_lines():
+    """
+    Returns the lines of the bundled Financials.csv, header included, to write test datasets from.
+    """
+
+    with open(FINANCIALS_CSV, encoding='utf-8', errors='replace') as file:
+        return file.read().splitlines(True)
+
+
+def blank_field(line, position):
+    """
+    Returns a CSV line of Financials.csv with one of its fields left empty.
+    """
+
+    # Amounts such as " $1,618.50 " are quoted, so the line is split and joined again as CSV
+    fields = next(csv.reader([line]))
+    fields[position] = ''
+
+    output = io.StringIO()
+    csv.writer(output, lineterminator=line[len(line.rstrip('\r\n')):]).writerow(fields)
+    return output.getvalue()
@@ -0,0 +1,63 @@
+import time
+
+import pandas as pd
+import pytest
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import blank_field
+
+
+@pytest.mark.parametrize('engine', ['kernel', 'pandas', 'sqlite', 'duckdb'])
+def test_appended_rows_keep_cube_cells_with_missing_labels(tmp_path, financials_lines, monkeypatch, engine):
+    monkeypatch.setattr(fe, 'FINANCIALS_ENGINE', engine)
+
+    # One row with an empty Product before the append and one in the appended rows
+    lines = list(financials_lines)
+    lines[5] = blank_field(lines[5], 2)
+    lines[500] = blank_field(lines[500], 2)
+
+    path = tmp_path / 'Financials.csv'
+    path.write_text(''.join(lines[:400]))
+    df = fd.load_financials(str(path))
+    fe.get_cube(df)
+
+    # Append the other rows, so the cached cube is updated by delta instead of being rebuilt
+    time.sleep(0.01)
+    with open(path, 'a') as file:
+        file.write(''.join(lines[400:]))
+    appended_df = fd.load_financials(str(path))
+    assert (fe.get_dataset_version(appended_df), fe._CUBE_KEY) in fe._aggregation_cache
+
+    cube = fe.get_cube(appended_df)
+    assert cube[fd.Product].isna().sum() == 2
+    pd.testing.assert_frame_equal(cube, fe.build_cube(appended_df))
+
+    # The tables answered from the cube match those of a full reload
+    reloaded_df = fd.read_and_clean_financials(str(path))
+    pd.testing.assert_frame_equal(fe.create_bar_table(appended_df, 'Segment', 'Sales'),
+                                  fe.create_bar_table(reloaded_df, 'Segment', 'Sales'))
+
+
+# An empty Sales field in the rows loaded first, in the appended rows, or nowhere
+@pytest.mark.parametrize('blank_line', [5, 500, None])
+def test_compact_appended_rows_keep_one_money_representation(tmp_path, financials_lines, blank_line):
+    lines = list(financials_lines)
+    if blank_line is not None:
+        lines[blank_line] = blank_field(lines[blank_line], 9)
+
+    path = tmp_path / 'Financials.csv'
+    path.write_text(''.join(lines[:400]))
+    df = fd.load_financials(str(path), compact=True)
+    fe.create_bar_table(df, fd.Segment, fd.Sales)
+
+    time.sleep(0.01)
+    with open(path, 'a') as file:
+        file.write(''.join(lines[400:]))
+    appended_df = fd.load_financials(str(path), compact=True)
+
+    # Sales is held the same way as when the whole file is compacted at once, and so are the tables built from it
+    reloaded_df = fd.compact_financials(fd.read_and_clean_financials(str(path)))
+    assert appended_df.dtypes[fd.Money_Columns].tolist() == reloaded_df.dtypes[fd.Money_Columns].tolist()
+    pd.testing.assert_frame_equal(fe.create_bar_table(appended_df, fd.Segment, fd.Sales),
+                                  fe.create_bar_table(reloaded_df, fd.Segment, fd.Sales))
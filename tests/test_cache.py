@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import FINANCIALS_CSV
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    """
+    Gives the test an empty aggregation cache with counters at zero, leaving the tables of other tests aside.
+    """
+
+    monkeypatch.setattr(fe, '_aggregation_cache', OrderedDict())
+    monkeypatch.setattr(fe, '_aggregation_cache_bytes', 0)
+    monkeypatch.setattr(fe, '_pinned_cache_bytes', 0)
+    monkeypatch.setattr(fe, '_aggregation_cache_stats', {'hits': 0, 'misses': 0, 'evictions': 0})
+
+
+def assert_bytes_match_entries():
+    """
+    Checks the byte counts of the cache against the sizes of its entries.
+    """
+
+    stats = fe.get_aggregation_cache_stats()
+    sizes = {pinned: sum(entry[3] for cache_key, entry in fe._aggregation_cache.items() if fe._is_pinned(cache_key) == pinned)
+             for pinned in (False, True)}
+
+    assert (stats['bytes'], stats['pinned_bytes']) == (sizes[False], sizes[True])
+
+
+def test_chart_tables_never_evict_the_cube(empty_cache, monkeypatch):
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+
+    builds = []
+    monkeypatch.setattr(fe, 'build_cube', lambda frame, build_cube=fe.build_cube: builds.append(1) or build_cube(frame))
+
+    # A budget well below the cube: every chart table is over it, but the cube is pinned outside of it
+    monkeypatch.setattr(fe, 'FINANCIALS_CACHE_BYTES', 0)
+
+    for y_axis in [fd.Sales, fd.Profit, fd.Units_Sold, fd.Sales]:
+        for x_axis in fd.Dimension_Columns:
+            items = fe.get_unique_items_list_in_column(df, x_axis)
+            fe.create_bar_table(df, x_axis, y_axis)
+            fe.create_bump_table(df, y_axis, x_axis, [2014], items)
+            fe.create_scatter_table(df, fd.Sales, y_axis, x_axis, items)
+
+    assert len(builds) == 1
+    assert (fe.get_dataset_version(df), fe._CUBE_KEY) in fe._aggregation_cache
+    assert fe.get_aggregation_cache_stats()['pinned_bytes'] >= fe._get_table_nbytes(fe.get_cube(df))
+    assert_bytes_match_entries()
+
+
+def test_least_recently_used_tables_are_evicted_first(empty_cache, monkeypatch):
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+    cube_nbytes = fe._get_table_nbytes(fe.get_cube(df))
+
+    # Tables of the same size, with room for three of them
+    def cache_table(name):
+        return fe._cached_aggregation(df, ('test_table', name), lambda frame: pd.DataFrame({name: np.zeros(100)}))
+
+    nbytes = fe._get_table_nbytes(pd.DataFrame({'a': np.zeros(100)}))
+    monkeypatch.setattr(fe, 'FINANCIALS_CACHE_BYTES', 3 * nbytes)
+
+    for name in ['a', 'b', 'c']:
+        cache_table(name)
+    assert fe.get_aggregation_cache_stats() == dict(hits=0, misses=4, evictions=0, tables=4, bytes=3 * nbytes,
+                                                    pinned_bytes=cube_nbytes,
+                                                    budget=3 * nbytes)
+
+    # Reading 'a' makes 'b' the least recently used table, so adding 'd' evicts 'b'
+    cache_table('a')
+    cache_table('d')
+
+    assert [cache_key[1] for cache_key in fe._aggregation_cache] == [fe._CUBE_KEY] + [('test_table', name) for name in 'cad']
+    stats = fe.get_aggregation_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['bytes']) == (1, 5, 1, 3 * nbytes)
+    assert_bytes_match_entries()
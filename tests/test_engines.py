@@ -0,0 +1,88 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import FINANCIALS_CSV
+
+
+# Engines compared with the pandas path. 'duckdb' uses SQLite when duckdb is not installed
+ENGINES = ['kernel', 'sqlite', 'duckdb']
+
+# Grouping columns of the aggregate checks: every single column, and every ordered pair of dimensions and 'Date'
+GROUPINGS = ([[column] for column in fd.Dimension_Columns + [fd.Date, fd.Year]]
+             + [list(pair) for pair in itertools.permutations(fd.Dimension_Columns + [fd.Date], 2)])
+
+FILTERS = [None, {fd.Year: [2014]}, {fd.Product: ['VTT', 'Paseo'], fd.Year: [2013, 2014]}, {fd.Product: []}]
+
+
+@pytest.fixture(scope='module')
+def datasets():
+    """
+    Returns the datasets every engine is checked on: the bundled dataset, its compact storage mode, and a copy with
+    missing labels and missing amounts.
+    """
+
+    regular = fd.read_and_clean_financials(FINANCIALS_CSV)
+
+    missing = regular.copy()
+    missing.loc[::7, fd.Country] = np.nan
+    missing.loc[::13, fd.Product] = np.nan
+    missing.loc[::11, fd.Sales] = np.nan
+
+    return {'regular': regular, 'compact': fd.compact_financials(regular), 'missing': missing}
+
+
+def build_tables(df, engine, monkeypatch):
+    """
+    Returns the tables of the engine pipelines on a DataFrame, computed with one engine.
+    """
+
+    monkeypatch.setattr(fe, 'FINANCIALS_ENGINE', engine)
+
+    # Cached tables are keyed on the DataFrame, not on the engine, so each engine gets its own copy
+    df = df.copy()
+    tables = {}
+
+    for by, filters in itertools.product(GROUPINGS, FILTERS):
+        if filters and set(filters) & set(by):
+            continue
+        for measures in ([fd.Sales], [fd.Units_Sold, fd.Profit, fd.COGS]):
+            for sort in (True, False):
+                table = fe.aggregate(df, by, measures, filters=filters, sort=sort)
+
+                # Without sorting, the order of the groups is left to the engine
+                if not sort:
+                    table = table.sort_values(by, ignore_index=True)
+
+                tables['aggregate', tuple(by), tuple(measures), repr(filters), sort] = table
+
+    tables['cube'] = fe.build_cube(df)
+
+    products = fe.get_unique_items_list_in_column(df, fd.Product)
+    for x_axis, y_axis in itertools.product(fd.Dimension_Columns, [fd.Sales, fd.Units_Sold, fd.Profit]):
+        items = fe.get_unique_items_list_in_column(df, x_axis)
+        tables['bar', x_axis, y_axis] = fe.create_bar_table(df, x_axis, y_axis)
+        tables['bump', x_axis, y_axis] = fe.create_bump_table(df, y_axis, x_axis, [2014], items)
+        tables['bump', x_axis, y_axis, 'years'] = fe.create_bump_table(df, y_axis, x_axis, [2013, 2014], items[:2])
+        tables['scatter', x_axis, y_axis] = fe.create_scatter_table(df, fd.Gross_Sales, y_axis, x_axis, items[:3])
+        if x_axis != fd.Product:
+            tables['stacked', x_axis, y_axis] = fe.create_stacked_bar_table(df, x_axis, y_axis, products)
+            tables['stacked', x_axis, y_axis, 'products'] = fe.create_stacked_bar_table(df, x_axis, y_axis, products[2:5])
+
+    return tables
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('dataset', ['regular', 'compact', 'missing'])
+def test_engine_tables_match_pandas(datasets, monkeypatch, dataset, engine):
+    expected = build_tables(datasets[dataset], 'pandas', monkeypatch)
+    tables = build_tables(datasets[dataset], engine, monkeypatch)
+
+    assert tables.keys() == expected.keys()
+    for key, table in tables.items():
+        # pandas sums floats with Kahan summation, the other engines do not
+        pd.testing.assert_frame_equal(table, expected[key], check_exact=False, rtol=1e-12, obj=repr(key))
@@ -0,0 +1,94 @@
+import gc
+import os
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import FINANCIALS_CSV
+
+
+# Number of simulated reruns after the warm-up, each rendering the four charts, over which the number of live objects
+# is checked. A rerun takes about 0.6s
+SOAK_RERUNS = int(os.environ.get('FINANCIALS_TEST_SOAK_RERUNS', 2000))
+
+# Reruns after which matplotlib's font and text layout caches, which are bounded, have filled up
+WARM_UP_RERUNS = 200
+
+# Largest growth of the number of objects tracked by the garbage collector between the end of the warm-up and the end
+# of the soak. A figure left behind holds thousands of them
+MAX_OBJECT_GROWTH = 1000
+
+# Number of reruns traced with tracemalloc, which takes about 2.5s per rerun
+TRACED_RERUNS = int(os.environ.get('FINANCIALS_TEST_RERUNS', 50))
+
+# Largest growth of the traced memory over the traced reruns. The bounded matplotlib caches may still take some
+# memory, everything else should be released
+MAX_GROWTH_BYTES = 8 * 2**20
+
+
+def render_dashboard(df, rerun):
+    """
+    Renders the four charts of the dashboard like a rerun does, cycling through the selections.
+    """
+
+    x_axis = fd.Dimension_Columns[rerun % 3]
+    y_axis = [fd.Sales, fd.Profit][rerun % 2]
+    items = fe.get_unique_items_list_in_column(df, x_axis)[:3]
+
+    bar_df = fe.create_bar_table(df, x_axis, y_axis)
+    colors, _ = fe.get_bar_highlights(bar_df, x_axis, y_axis)
+    fe.render_chart(fe.plot_bar_chart, bar_df, x_axis, y_axis, colors, dpi=50)
+
+    products_df_pivot = fe.create_stacked_bar_table(df, x_axis, y_axis, ['VTT', 'Paseo'])
+    fe.render_chart(fe.plot_stacked_bar_chart, products_df_pivot, dpi=50)
+
+    bump_df_pivot = fe.create_bump_table(df, y_axis, x_axis, [2014], items)
+    fe.render_chart(fe.plot_bump_chart, bump_df_pivot, dpi=50)
+
+    scatter_df = fe.create_scatter_table(df, fd.Sales, fd.Profit, x_axis, items)
+    fe.render_chart(fe.plot_scatter_chart, scatter_df, fd.Sales, fd.Profit, x_axis, items, dpi=50)
+
+
+def test_rendering_keeps_no_figures_and_memory_flat(monkeypatch):
+    # Every rerun renders its charts again instead of reading them from the cache
+    monkeypatch.setattr(fe, 'FINANCIALS_CHART_CACHE_BYTES', 0)
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+
+    # Fill matplotlib's caches and the aggregation cache first
+    for rerun in range(WARM_UP_RERUNS):
+        render_dashboard(df, rerun)
+
+    gc.collect()
+    objects_before = len(gc.get_objects())
+
+    # Count the live objects before and after the soak, without tracemalloc so it runs thousands of reruns. pytest
+    # keeps every warning raised in a test, e.g. matplotlib's FixedFormatter warning on each bump chart, so warnings
+    # are ignored here to only count the objects the dashboard keeps
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+
+        for rerun in range(SOAK_RERUNS):
+            render_dashboard(df, rerun)
+            assert plt.get_fignums() == []
+
+        gc.collect()
+        assert len(gc.get_objects()) - objects_before < MAX_OBJECT_GROWTH
+
+    tracemalloc.start()
+    try:
+        for rerun in range(TRACED_RERUNS):
+            render_dashboard(df, rerun)
+            assert plt.get_fignums() == []
+
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert growth < MAX_GROWTH_BYTES
+    assert fe.get_chart_cache_stats()['images'] <= 1
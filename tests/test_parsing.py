@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+import financials_data as fd
+from conftest import FINANCIALS_CSV
+
+
+def parse_with_replace(values):
+    """
+    Parses accounting formatted strings the way clean_financials did before parse_accounting_numbers: a whitespace
+    strip, two regex replace passes and a float cast.
+    """
+
+    values = values.str.strip()
+    values = values.replace({r'\$': '', '-': '0', ',': ''}, regex=True)
+    values = values.replace({r'\(': '-', r'\)': '', ' ': ''}, regex=True)
+
+    return values.astype(float)
+
+
+@pytest.mark.parametrize('value, expected', [(' $1,618.50 ', 1618.5), (' $-   ', 0.0), ('$(4,533.75)', -4533.75)])
+def test_accounting_number_matches_replace_path(value, expected):
+    values = pd.Series([value], name=fd.Sales)
+
+    parsed = fd.parse_accounting_numbers(values)
+
+    pd.testing.assert_series_equal(parsed, parse_with_replace(values))
+    assert parsed[0] == expected
+
+
+def test_dataset_columns_match_replace_path():
+    raw_df = pd.read_csv(FINANCIALS_CSV)
+    raw_df.columns = raw_df.columns.str.strip()
+
+    for column in fd.Numerical_Columns:
+        pd.testing.assert_series_equal(fd.parse_accounting_numbers(raw_df[column]), parse_with_replace(raw_df[column]))
@@ -0,0 +1,30 @@
+import os
+
+import pandas as pd
+
+import financials_data as fd
+
+
+def write_partitions(directory, lines):
+    """
+    Writes the rows of Financials.csv into two partition CSV files, split at the row 300.
+    """
+
+    header, rows = lines[0], lines[1:]
+    for name, part in (('p1.csv', rows[:300]), ('p2.csv', rows[300:])):
+        (directory / name).write_text(header + ''.join(part))
+
+
+def test_glob_pattern_skips_snapshots(tmp_path, financials_lines):
+    write_partitions(tmp_path, financials_lines)
+    pattern = str(tmp_path / 'p*')
+
+    # The first load writes a snapshot next to each partition, which the same pattern also matches
+    df = fd.load_financials(pattern)
+    assert any(name.endswith('.feather') for name in os.listdir(tmp_path))
+
+    assert fd.get_partition_paths(pattern) == [str(tmp_path / 'p1.csv'), str(tmp_path / 'p2.csv')]
+
+    # Loading again from the snapshots returns the same dataset
+    fd._financials_cache.clear()
+    pd.testing.assert_frame_equal(fd.load_financials(pattern), df)
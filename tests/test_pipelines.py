@@ -0,0 +1,52 @@
+import gc
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import FINANCIALS_CSV
+
+
+# Largest traced peak of a cold run of every chart pipeline, as a multiple of the memory used by the dataset. Copying
+# the dataset per chart peaked at 2.8 times the dataset
+MAX_PEAK_FOOTPRINTS = 1.5
+
+
+@pytest.fixture(scope='module')
+def large_financials():
+    """
+    Returns the bundled dataset repeated 300 times (210,000 rows), so the dataset outweighs the tables built from it.
+    """
+
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+
+    return pd.concat([df] * 300, ignore_index=True)
+
+
+# The SQL engines load the dataset into a database, so only the in-memory engines are checked
+@pytest.mark.parametrize('engine', ['kernel', 'pandas'])
+def test_pipelines_peak_below_dataset_footprint(large_financials, monkeypatch, engine):
+    monkeypatch.setattr(fe, 'FINANCIALS_ENGINE', engine)
+
+    # A copy has nothing in the aggregation cache, so every pipeline runs cold, including the cube build
+    df = large_financials.copy()
+    footprint = fd.get_memory_footprint(df)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for x_axis in fd.Dimension_Columns:
+            items = fe.get_unique_items_list_in_column(df, x_axis)
+            fe.create_bar_table(df, x_axis, fd.Sales)
+            if x_axis != fd.Product:
+                fe.create_stacked_bar_table(df, x_axis, fd.Profit, ['VTT', 'Paseo'])
+            fe.create_bump_table(df, fd.Sales, x_axis, [2014], items[:3])
+            fe.create_scatter_table(df, fd.Sales, fd.Profit, x_axis, items[:3])
+
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert peak < MAX_PEAK_FOOTPRINTS * footprint
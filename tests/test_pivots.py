@@ -0,0 +1,32 @@
+import pandas as pd
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import FINANCIALS_CSV
+
+
+def test_changed_selections_match_cold_pivots():
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+    products = fe.get_unique_items_list_in_column(df, fd.Product)
+    countries = fe.get_unique_items_list_in_column(df, fd.Country)
+
+    # Each selection is computed against the previous one, and checked against a cold build on a copy of the dataset
+    for x_axis in [fd.Segment, fd.Product]:
+        for product_List in [products, products[1:], products[:2], products[::-1], [], ['VTT', 'Unknown'], products]:
+            pd.testing.assert_frame_equal(fe.create_stacked_bar_table(df, x_axis, fd.Units_Sold, product_List),
+                                          fe.create_stacked_bar_table(df.copy(), x_axis, fd.Units_Sold, product_List))
+
+    for country_list in [countries, countries[2:], countries[:1] + countries[3:], []]:
+        pd.testing.assert_frame_equal(fe.create_bump_table(df, fd.Sales, fd.Country, [2014], country_list),
+                                      fe.create_bump_table(df.copy(), fd.Sales, fd.Country, [2014], country_list))
+
+
+def test_pivot_adds_few_tables_whatever_the_number_of_items():
+    df = fd.read_and_clean_financials(FINANCIALS_CSV)
+    fe.get_cube(df)
+    tables = fe.get_aggregation_cache_stats()['tables']
+
+    # The pivot table, the sums of every selected item in one aggregate, the sums kept for the next selection and the
+    # row index of the 'Product' filter
+    fe.create_stacked_bar_table(df, fd.Segment, fd.Sales, fe.get_unique_items_list_in_column(df, fd.Product))
+    assert fe.get_aggregation_cache_stats()['tables'] - tables <= 4
@@ -0,0 +1,63 @@
+import time
+
+import pandas as pd
+import pytest
+
+import financials_data as fd
+import financials_engine as fe
+from conftest import blank_field
+
+
+@pytest.fixture
+def lines_with_missing_labels(financials_lines):
+    """
+    Returns the lines of Financials.csv with an empty Product, Country and Segment in a few rows, across chunks.
+    """
+
+    lines = list(financials_lines)
+    lines[5] = blank_field(lines[5], 2)
+    lines[250] = blank_field(lines[250], 1)
+    lines[251] = blank_field(lines[251], 1)
+    lines[600] = blank_field(lines[600], 0)
+
+    return lines
+
+
+def assert_same_totals(totals_df, df):
+    """
+    Checks that totals and row level data give the same cube, missing labels included.
+    """
+
+    assert totals_df[fd.Dimension_Columns].isna().sum().tolist() == [1, 2, 1, 0]
+    pd.testing.assert_frame_equal(fe.build_cube(totals_df), fe.build_cube(df))
+
+
+def test_streamed_totals_keep_missing_labels(tmp_path, lines_with_missing_labels):
+    path = tmp_path / 'Financials.csv'
+    path.write_text(''.join(lines_with_missing_labels))
+
+    assert_same_totals(fd.stream_financials_totals(str(path), 100), fd.read_and_clean_financials(str(path)))
+
+
+def test_streamed_partitions_keep_missing_labels(tmp_path, lines_with_missing_labels):
+    header, rows = lines_with_missing_labels[0], lines_with_missing_labels[1:]
+    for name, part in (('p1.csv', rows[:300]), ('p2.csv', rows[300:])):
+        (tmp_path / name).write_text(header + ''.join(part))
+
+    totals_df = fd.read_financials_partitions(fd.get_partition_paths(str(tmp_path)), chunksize=100)
+    df = fd.read_financials_partitions(fd.get_partition_paths(str(tmp_path)))
+
+    assert_same_totals(totals_df, df)
+
+
+def test_streamed_appended_rows_keep_missing_labels(tmp_path, lines_with_missing_labels):
+    path = tmp_path / 'Financials.csv'
+    path.write_text(''.join(lines_with_missing_labels[:400]))
+    fd.load_financials(str(path), chunksize=100)
+
+    # Only the appended rows are read and summed into the cached totals
+    time.sleep(0.01)
+    with open(path, 'a') as file:
+        file.write(''.join(lines_with_missing_labels[400:]))
+
+    assert_same_totals(fd.load_financials(str(path), chunksize=100), fd.read_and_clean_financials(str(path)))